@@ -1,10 +1,20 @@
 import pandas as pd
-import pyarrow.parquet as pq
 import os
-import json
 import gc
 import psutil
-from collections import defaultdict
+from 并行处理 import process_files_parallel
+from 批量解析 import decode_purchase_history
+from 全局统计 import load_or_compute_global_stats
+from 数据读取 import build_zone_index
+from 数据写出 import make_writer, BATCHES_PER_FILE, print_file_summary
+from 抽样层级 import SAMPLE_TIERS, tier_dir
+from 类别字典 import load_or_build_categories, apply_categories
+from 省份解析 import resolve_provinces
+from 列式处理 import process_chunk_arrow
+from 时间解析 import TimestampParser
+from 输出模式 import SchemaViolation
+from 预处理流水线 import PIPELINE_SPEC, plan_file_groups, scan_row_groups
+from 自适应批次 import AdaptiveBatchController, adaptive_batches
 
 
 def mem_usage():
@@ -12,53 +22,38 @@ def mem_usage():
     return psutil.Process().memory_info().rss / (1024 ** 2)
 
 
-def get_all_categories(input_dir):
-    """预扫描所有文件获取完整的分类变量取值范围"""
-    category_values = defaultdict(set)
+def get_all_categories(input_dir, cache_path=None):
+    """预扫描所有文件获取完整的分类变量取值范围，得到全局稳定的字典（按文件增量缓存）"""
     files = [os.path.join(input_dir, f) for f in os.listdir(input_dir)
              if f.startswith('part-') and f.endswith('.parquet')]
+    return load_or_build_categories(files, cache_path)
 
-    # 只扫描前几个文件获取大致分类范围
-    for file in files[:2]:  # 调整这个数字以平衡准确性和性能
-        parquet_file = pq.ParquetFile(file)
-        for batch in parquet_file.iter_batches(batch_size=10000):
-            df = batch.to_pandas()
-
-            # 收集分类变量的所有可能值
-            if 'category' in df.columns:
-                category_values['category'].update(df['category'].unique())
-            if 'gender' in df.columns:
-                category_values['gender'].update(df['gender'].unique())
-            if 'country' in df.columns:
-                category_values['country'].update(df['country'].unique())
-            if 'province' in df.columns:
-                category_values['province'].update(df['province'].str.extract(r'^(.*?省)')[0].unique())
-
-    # 转换为排序后的列表，确保顺序一致
-    return {k: sorted(v) for k, v in category_values.items()}
-
-
-def process_chunk(df, all_categories):
-    """处理单个数据块的函数"""
-    # 转换时间类型并统一时区
-    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize(None)
-    df['registration_date'] = pd.to_datetime(df['registration_date']).dt.tz_localize(None)
-
-    # 处理JSON字段 - 使用更安全的方式
+
+def process_chunk(df, all_categories, global_stats=None, time_parser=None):
+    """处理单个数据块的函数，global_stats 为全局统计量（为空时退化为按块统计），
+    time_parser 为同一文件共用的 时间解析.TimestampParser（格式只检测一次）"""
+    # 转换时间类型并统一时区（不带时区的微秒时间戳）
+    time_parser = time_parser or TimestampParser()
+    df['timestamp'] = time_parser.parse_series('timestamp', df['timestamp'])
+    df['registration_date'] = time_parser.parse_series('registration_date', df['registration_date'])
+
+    # 处理JSON字段 - 整列批量解析，不再逐行 json.loads
     try:
-        df['purchase_history'] = df['purchase_history'].apply(json.loads)
-        purchase_df = pd.json_normalize(df['purchase_history'])
+        purchase_df = decode_purchase_history(df['purchase_history'])
         df = pd.concat([df.drop('purchase_history', axis=1), purchase_df], axis=1)
-        df['items_count'] = df['items'].apply(lambda x: len(x) if isinstance(x, list) else 0)
-        df = df.drop('items', axis=1)
     except Exception as e:
         print(f"JSON处理错误: {e}")
         df['items_count'] = 0
 
-    # 处理缺失值
-    median_age = df['age'].median()
-    median_income = df['income'].median()
-    median_credit = df['credit_score'].median()
+    # 处理缺失值（优先使用全局中位数，保证不同分块方式结果一致）
+    if global_stats is not None:
+        median_age = global_stats['age']['median']
+        median_income = global_stats['income']['median']
+        median_credit = global_stats['credit_score']['median']
+    else:
+        median_age = df['age'].median()
+        median_income = df['income'].median()
+        median_credit = df['credit_score'].median()
 
     df = df.assign(
         age=df['age'].fillna(median_age),
@@ -70,15 +65,19 @@ def process_chunk(df, all_categories):
     # 处理异常值
     df = df[(df['age'] > 0) & (df['age'] < 120)]
 
-    Q1 = df['income'].quantile(0.25)
-    Q3 = df['income'].quantile(0.75)
+    if global_stats is not None:
+        Q1 = global_stats['income']['q1']
+        Q3 = global_stats['income']['q3']
+    else:
+        Q1 = df['income'].quantile(0.25)
+        Q3 = df['income'].quantile(0.75)
     IQR = Q3 - Q1
     df = df[~((df['income'] < (Q1 - 1.5 * IQR)) | (df['income'] > (Q3 + 1.5 * IQR)))]  # 去除收入异常值
 
     df = df[(df['credit_score'] >= 300) & (df['credit_score'] <= 850)]  # 去除信用分异常值
 
     # 特征工程
-    df['province'] = df['chinese_address'].str.extract(r'^(.*?省)')
+    df['province'] = resolve_provinces(df['chinese_address'])
     df['hour'] = df['timestamp'].dt.hour
     df['day_of_week'] = df['timestamp'].dt.dayofweek
     df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
@@ -86,51 +85,93 @@ def process_chunk(df, all_categories):
     # 计算注册时间到当前时间的天数
     df['days_since_registration'] = (df['timestamp'] - df['registration_date']).dt.days
 
+    # 分类列使用全局字典编码，所有输出文件中的编码一致
+    df = apply_categories(df, all_categories)
+
     # 返回经过处理的数据
     return df
 
 
-def process_file(input_file, output_dir, all_categories, chunk_size=50000):
-    """处理单个文件"""
+def process_file(input_file, output_dir, all_categories, chunk_size=50000, global_stats=None,
+                 batches_per_file=BATCHES_PER_FILE, writer_options=None, spec=PIPELINE_SPEC, partition_keys=None,
+                 controller=None, engine='pandas', sample_tiers=None):
+    """处理单个文件：按 row group 分组，每组的结果合并写入一个大文件（指定 partition_keys 时按分区写出），返回输出文件汇总
+    controller 为 自适应批次.AdaptiveBatchController 时批次大小随内存和吞吐动态调整，
+    engine 为 'arrow' 时使用 列式处理.process_chunk_arrow 直接处理 Arrow 批次，不转换为 DataFrame，
+    sample_tiers 不为空时同一遍写出这些比例的抽样层级（见 抽样层级.py）"""
     print(f"正在处理文件: {input_file}")
 
-    # 创建Parquet文件读取器
-    parquet_file = pq.ParquetFile(input_file)
-
-    # 分批读取和处理
-    for i, batch in enumerate(parquet_file.iter_batches(batch_size=chunk_size)):
-        print(f"处理批次 {i + 1}, 内存使用: {mem_usage():.2f} MB")
-
-        try:
-            # 转换为DataFrame
-            df = batch.to_pandas()
-
-            # 处理数据块
-            processed_df = process_chunk(df, all_categories)
+    writer = make_writer(output_dir, os.path.splitext(os.path.basename(input_file))[0],
+                         writer_options, partition_keys, sample_tiers)
+    groups = plan_file_groups(input_file, chunk_size * batches_per_file)
+    time_parser = TimestampParser()
 
-            # 保存结果
-            output_file = os.path.join(output_dir,
-                                       f"{os.path.splitext(os.path.basename(input_file))[0]}_part{i}.parquet")
-            processed_df.to_parquet(output_file)
-
-        except Exception as e:
-            print(f"处理批次 {i + 1} 时出错: {e}")
-            continue
-
-        finally:
-            # 确保释放内存
-            del df, processed_df
-            gc.collect()
-
-
-def main():
+    # 分批读取和处理：列裁剪和数值过滤在读取时完成，不满足条件的行不会进入JSON解析
+    i = 0
+    skipped_batches = skipped_rows = 0
+    try:
+        for file_index, row_groups in enumerate(groups):
+            batches = scan_row_groups(input_file, row_groups, spec, global_stats, chunk_size)
+            if controller is not None:
+                batches = adaptive_batches(batches, controller)
+            for batch in batches:
+                i += 1
+                print(f"处理批次 {i} ({batch.num_rows} 行), 内存使用: {mem_usage():.2f} MB")
+                df = processed_df = None
+
+                try:
+                    if engine == 'arrow':
+                        processed_df = process_chunk_arrow(batch, all_categories, global_stats, time_parser)
+                    else:
+                        # 转换为DataFrame
+                        df = batch.to_pandas()
+
+                        # 处理数据块
+                        processed_df = process_chunk(df, all_categories, global_stats, time_parser)
+
+                    # 追加写入当前输出文件
+                    writer.write(file_index, processed_df)
+
+                except SchemaViolation:
+                    # 输出列超出允许范围说明清洗逻辑有误，直接中止，不能静默丢弃整个批次
+                    raise
+
+                except Exception as e:
+                    skipped_batches += 1
+                    skipped_rows += batch.num_rows
+                    print(f"处理批次 {i} 时出错，跳过 {batch.num_rows} 行: {e}")
+                    continue
+
+                finally:
+                    # 确保释放内存
+                    del df, processed_df
+                    gc.collect()
+    finally:
+        summary = writer.close()
+
+    if skipped_batches:
+        print(f"⚠️ {input_file}: 共跳过 {skipped_batches} 个出错的批次, {skipped_rows} 行")
+    time_parser.report()
+    return summary
+
+
+def main(workers=1, memory_budget_mb=2048, batches_per_file=BATCHES_PER_FILE, writer_options=None,
+         partition_keys=None, adaptive=True, engine='pandas', sample_tiers=SAMPLE_TIERS):
+    """workers 大于1时使用进程池并行处理，memory_budget_mb 为每个工作进程的内存预算(MB)，
+    adaptive 为 True 时批次大小在 memory_budget_mb 以内根据内存和吞吐自动调整，
+    writer_options 覆盖 数据写出.DEFAULT_WRITER_OPTIONS 中的 row group 大小、压缩算法、字典编码和统计信息设置，
+    partition_keys 不为空时按这些列写出 Hive 风格的分区目录，如 ['country', 'purchase_month']，
+    engine 为 'pandas' 或 'arrow'，两种处理引擎的输出一致（对比见 引擎性能对比.py），
+    sample_tiers 为同时写出的抽样比例（按 id 哈希抽样，写到 输出目录/_samples/ 下，为空时不写出）"""
+    if engine not in ('pandas', 'arrow'):
+        raise ValueError(f"未知的处理引擎: {engine}")
     input_dir = '30G_data/'
     output_dir = '30processed_data111/'
     os.makedirs(output_dir, exist_ok=True)
 
     # 预扫描获取所有分类变量的可能取值
     print("正在预扫描数据以获取分类变量范围...")
-    all_categories = get_all_categories(input_dir)
+    all_categories = get_all_categories(input_dir, os.path.join(output_dir, 'categories.json'))
     print("发现以下分类变量范围:")
     for k, v in all_categories.items():
         print(f"{k}: {v}")
@@ -139,9 +180,33 @@ def main():
     files = [os.path.join(input_dir, f) for f in os.listdir(input_dir)
              if f.startswith('part-') and f.endswith('.parquet')]
 
+    # 第一遍：只读 age/income/credit_score 构建分位数草图，得到全局中位数和IQR边界（结果缓存，重跑时跳过）
+    print("正在计算全局统计量...")
+    global_stats = load_or_compute_global_stats(files, os.path.join(output_dir, 'global_stats.json'))
+    for k, v in global_stats.items():
+        print(f"{k}: 中位数 {v['median']}, Q1 {v['q1']}, Q3 {v['q3']}")
+
     # 处理每个文件
-    for file in files:
-        process_file(file, output_dir, all_categories)
+    if workers > 1:
+        summary = process_files_parallel(files, output_dir, all_categories, process_chunk,
+                                         workers=workers, memory_budget_mb=memory_budget_mb,
+                                         global_stats=global_stats, batches_per_file=batches_per_file,
+                                         writer_options=writer_options, partition_keys=partition_keys,
+                                         adaptive=adaptive, engine=engine, sample_tiers=sample_tiers)
+    else:
+        summary = []
+        controller = AdaptiveBatchController(memory_budget_mb) if adaptive else None
+        for file in files:
+            summary.extend(process_file(file, output_dir, all_categories, global_stats=global_stats,
+                                        batches_per_file=batches_per_file, writer_options=writer_options,
+                                        partition_keys=partition_keys, controller=controller, engine=engine,
+                                        sample_tiers=sample_tiers))
+    print_file_summary(summary)
+
+    # 区域索引：只为新增或修改过的输出文件建立索引，分析脚本据此跳过不满足条件的文件和 row group
+    for d in [output_dir] + [tier_dir(output_dir, t) for t in sample_tiers or []]:
+        if os.path.isdir(d):
+            build_zone_index(d)
 
     print("所有文件处理完成！")
 
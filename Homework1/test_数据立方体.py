@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pandas as pd
+from 数据立方体 import CUBE_DIR, CUBE_FILE, Cube, build_cube
+
+
+def write_data(base_dir, n_files=2, rows=500):
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(n_files):
+        df = pd.DataFrame({
+            'country': rng.choice(['中国', '美国', '日本'], rows),
+            'gender': rng.choice(['男', '女', '其他'], rows),
+            'age': rng.integers(18, 90, rows),
+            'income': rng.uniform(0, 1200000, rows),
+            'average_price': rng.uniform(10, 5000, rows),
+        })
+        df.to_parquet(os.path.join(base_dir, f'part-{i:05d}.parquet'))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_changing_cuboids_rebuilds_cube(tmp_path):
+    df = write_data(tmp_path)
+    expected = df['gender'].value_counts().sort_index()
+
+    build_cube(str(tmp_path))
+    counts = Cube.load(str(tmp_path), refresh=False).query('gender')['count'].sort_index()
+    assert (counts.values == expected.values).all()
+
+    # 换一组维度组合后重建：计数不能与旧立方体的单元格叠加，已去掉的组合也不能残留
+    build_cube(str(tmp_path), cuboids=[('gender',), ('country',)])
+    cube = Cube.load(str(tmp_path), refresh=False)
+    assert set(cube.cuboids) == {'gender', 'country'}
+    counts = cube.query('gender')['count'].sort_index()
+    assert (counts.values == expected.values).all()
+    assert len(os.listdir(os.path.join(tmp_path, CUBE_DIR, 'parts'))) == 2
+
+
+def test_incremental_update_adds_new_file(tmp_path):
+    df = write_data(tmp_path, n_files=1)
+    build_cube(str(tmp_path))
+    extra = write_data(tmp_path, n_files=2).iloc[len(df):]
+
+    build_cube(str(tmp_path))
+    cells = pd.read_parquet(os.path.join(tmp_path, CUBE_DIR, CUBE_FILE))
+    counts = Cube(cells).query('country')['count'].sort_index()
+    expected = pd.concat([df, extra])['country'].value_counts().sort_index()
+    assert (counts.values == expected.values).all()
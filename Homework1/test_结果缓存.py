@@ -0,0 +1,35 @@
+import os
+import numpy as np
+import pandas as pd
+from 全量分析 import compute_results
+from 结果缓存 import ResultCache
+
+
+def write_data(base_dir, n_files=2, rows=500):
+    rng = np.random.default_rng(0)
+    for i in range(n_files):
+        pd.DataFrame({
+            'country': rng.choice(['中国', '美国', '日本'], rows),
+            'gender': rng.choice(['男', '女', None], rows),
+            'age': rng.integers(18, 90, rows),
+            'income': rng.uniform(0, 1200000, rows),
+        }).to_parquet(os.path.join(base_dir, f'part-{i:05d}.parquet'))
+
+
+def test_cached_results_equal_cold_results(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    write_data(str(data_dir))
+    cache_dir = str(tmp_path / 'cache')
+
+    cold = compute_results(str(data_dir), cache=ResultCache(cache_dir))
+    cached = compute_results(str(data_dir), cache=ResultCache(cache_dir))
+    assert set(cold) == set(cached)
+    # 命中缓存的结果与直接计算的结果完全一致：索引类型（包括分类的类别）、列名、Series 名称都不变
+    for name, result in cold.items():
+        if isinstance(result, pd.Series):
+            pd.testing.assert_series_equal(cached[name], result)
+        elif isinstance(result, pd.DataFrame):
+            pd.testing.assert_frame_equal(cached[name], result)
+        else:
+            assert cached[name] == result and type(cached[name]) is type(result)
@@ -1,8 +1,7 @@
 import os
 import pandas as pd
-import pyarrow.parquet as pq
-import random
 import matplotlib.pyplot as plt
+from 全量分析 import load_result
 
 # 设置输入输出路径
 input_dir = 'processed_data/'
@@ -12,36 +11,19 @@ output_dir = 'pictures/pprovince/'
 os.makedirs(output_dir, exist_ok=True)
 
 
-def load_and_clean_data(input_dir):
-    """加载并清洗数据"""
-    files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.parquet')]
-    data_frames = []
+def process_all_files(input_dir):
+    """各省份的收入中位数和平均消费金额（只统计性别为 男/女 的记录），即 全量分析 中的
+    province_income_median、province_price：全量数据一遍扫描归约，经结果缓存，数据未变化时不再扫描
+    """
+    return {
+        'income': load_result('province_income_median', input_dir=input_dir),
+        'average_price': load_result('province_price', input_dir=input_dir),
+    }
 
-    for file in files:
-        parquet_file = pq.ParquetFile(file)
-        for batch in parquet_file.iter_batches(batch_size=50000):
-            df = batch.to_pandas()
 
-            # 去除不符合要求的性别数据
-            df = df[df['gender'].isin(['男', '女'])]
-
-            # 只保留需要的字段
-            df = df[['province', 'income', 'average_price']]
-
-            data_frames.append(df)
-
-    # 合并所有数据
-    return pd.concat(data_frames, ignore_index=True)
-
-
-def sample_data(df, sample_size=0.1):
-    """从数据中抽取随机样本"""
-    return df.sample(frac=sample_size, random_state=42)
-
-
-def plot_income_difference(df, output_file):
-    """按省份绘制年收入差异图"""
-    income_by_province = df.groupby('province')['income'].median().sort_values(ascending=False)
+def plot_income_difference(aggregates, output_file):
+    """按省份绘制年收入差异图（中位数来自各省份的分位数草图）"""
+    income_by_province = aggregates['income'].sort_values(ascending=False)
 
     plt.figure(figsize=(12, 8))
     income_by_province.plot(kind='bar', color='skyblue')
@@ -54,9 +36,9 @@ def plot_income_difference(df, output_file):
     plt.close()
 
 
-def plot_average_price_difference(df, output_file):
+def plot_average_price_difference(aggregates, output_file):
     """按省份绘制平均消费金额差异图"""
-    avg_price_by_province = df.groupby('province')['average_price'].mean().sort_values(ascending=False)
+    avg_price_by_province = aggregates['average_price'].sort_values(ascending=False)
 
     plt.figure(figsize=(12, 8))
     avg_price_by_province.plot(kind='bar', color='lightgreen')
@@ -70,18 +52,15 @@ def plot_average_price_difference(df, output_file):
 
 
 def main():
-    # 加载并清洗数据
-    df = load_and_clean_data(input_dir)
-
-    # 从数据中抽样
-    sampled_df = sample_data(df)
+    # 全量数据的聚合结果
+    aggregates = process_all_files(input_dir)
 
     # 绘制并保存图表
     income_output_file = os.path.join(output_dir, 'income_difference.png')
-    plot_income_difference(sampled_df, income_output_file)
+    plot_income_difference(aggregates, income_output_file)
 
     avg_price_output_file = os.path.join(output_dir, 'average_price_difference.png')
-    plot_average_price_difference(sampled_df, avg_price_output_file)
+    plot_average_price_difference(aggregates, avg_price_output_file)
 
     print("图片已保存至:", output_dir)
 
@@ -3,7 +3,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import matplotlib
-from tqdm import tqdm  # 导入tqdm库
+from 数据读取 import read_sample
 
 # 设置中文字体
 matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # 根据你的系统选择合适的中文字体
@@ -17,22 +17,10 @@ output_directory = 'pictures/ppppp'  # 设置保存图片的文件夹路径
 if not os.path.exists(output_directory):
     os.makedirs(output_directory)
 
-# 遍历所有parquet文件，加载数据
-parquet_files = [f for f in os.listdir(input_directory) if f.endswith('5.parquet')]
-
-# 初始化空的DataFrame来存储所有数据
-all_data = pd.DataFrame()
-
-# 使用tqdm显示进度条加载数据
-for file in tqdm(parquet_files, desc="加载文件", ncols=100):
-    file_path = os.path.join(input_directory, file)
-    df = pd.read_parquet(file_path)
-
-    # 将数据追加到all_data中
-    all_data = pd.concat([all_data, df], ignore_index=True)
-
-# 处理数据：从全部数据中抽样（例如，抽取10%的数据）
-sampled_df = all_data.sample(frac=0.1, random_state=42)  # 10%的抽样，random_state保证重复性
+# 读取预处理时写出的10%抽样层级（按 id 哈希抽样，结果可复现），只读取需要的列
+# 与原脚本一样只分析文件名以 5.parquet 结尾的输出文件（预处理合并小文件后，这些文件与原来的批次不再一一对应）
+sampled_df = read_sample(input_directory, 0.1, columns=['province', 'category'],
+                         files='*5.parquet')
 
 # 统计每个省份和消费类别的分布
 category_counts_by_province = sampled_df.groupby(['province', 'category']).size().unstack(fill_value=0)
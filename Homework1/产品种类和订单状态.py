@@ -1,7 +1,7 @@
 import os
-import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from 全量分析 import load_result
 
 # 设置字体（适配中文系统可省略）
 plt.rcParams['font.sans-serif'] = ['Noto Sans CJK', 'Microsoft YaHei', 'SimHei']  # 可以根据系统选择相应的字体
@@ -9,33 +9,13 @@ plt.rcParams['axes.unicode_minus'] = False  # 防止负号显示为方块
 
 
 def plot_payment_status_heatmap(input_folder, output_image_path):
-    # 存储所有数据
-    category_payment_data = []
-
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.parquet'):
-            file_path = os.path.join(input_folder, filename)
-            try:
-                df = pd.read_parquet(file_path, columns=["categories", "payment_status"])
-                category_payment_data.append(df)
-                print(f"✅ Processed: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to process {filename}: {e}")
-            break
-
-    if not category_payment_data:
+    # 各类别中不同支付状态的计数（全量分析 中的 category_payment_status，经结果缓存，数据未变化时不再扫描；
+    # 原来读取的 categories 列在现在的预处理输出中为 category）
+    payment_counts = load_result('category_payment_status', input_dir=input_folder)
+    if payment_counts.empty:
         print("⚠️ No data collected.")
         return
 
-    # 合并所有数据
-    combined_df = pd.concat(category_payment_data, ignore_index=True)
-
-    # 删除空值
-    combined_df = combined_df.dropna(subset=["categories", "payment_status"])
-
-    # 计算每个类别中不同支付状态的计数
-    payment_counts = combined_df.groupby(["categories", "payment_status"]).size().unstack(fill_value=0)
-
     # 计算比例
     payment_ratio = payment_counts.div(payment_counts.sum(axis=1), axis=0)
 
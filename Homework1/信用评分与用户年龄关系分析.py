@@ -33,7 +33,8 @@ def load_data(file_pattern, sample_size=10):
 def credit_score_vs_age(df):
     """信用评分与用户年龄的关系分析"""
     # 假设数据中有 'age' 列，表示用户的年龄
-    bins = np.arange(0, df['age'].max() + 10, 10)
+    # age 为 int8，转换为 Python 整数后再加，避免 120 + 10 溢出
+    bins = np.arange(0, int(df['age'].max()) + 10, 10)
     labels = [f'{i}-{i + 9}' for i in bins[:-1]]
 
     df['age_range'] = pd.cut(df['age'], bins=bins, labels=labels, right=False)
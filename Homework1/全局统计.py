@@ -0,0 +1,141 @@
+import os
+import json
+import math
+import numpy as np
+import pyarrow.parquet as pq
+
+# 需要全局统计的数值列
+STATS_COLUMNS = ['age', 'income', 'credit_score']
+
+
+class KLLSketch:
+    """KLL分位数草图：内存有界、可合并，秩误差约为 1.7/k"""
+
+    def __init__(self, k=400, seed=42):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        """逐层压缩：排序后隔一个取一个提升到上一层，权重翻倍"""
+        while sum(len(x) for x in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            for h in range(len(self.levels)):
+                if len(self.levels[h]) >= self._capacity(h):
+                    break
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            items = items[:len(items) - len(keep)]
+            promoted = items[self.rng.integers(2)::2]
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+
+    def update(self, values):
+        """批量加入数值（自动忽略缺失值）"""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """合并另一个草图，结果与把两份数据合在一起构建的草图等价（误差界不变）"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """返回一组分位数的估计值"""
+        if self.n == 0:
+            return [float('nan')] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(x), 2 ** h, dtype='float64') for h, x in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cum = items[order], np.cumsum(weights[order])
+        ranks = np.asarray(qs, dtype='float64') * cum[-1]
+        idx = np.minimum(np.searchsorted(cum, ranks, side='left'), len(items) - 1)
+        return items[idx].tolist()
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'levels': [x.tolist() for x in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(k=d['k'])
+        sketch.n = d['n']
+        sketch.levels = [np.asarray(x, dtype='float64') for x in d['levels']]
+        return sketch
+
+
+def file_key(path):
+    """文件指纹：文件名 + 大小 + 修改时间，用于判断缓存是否仍然有效"""
+    st = os.stat(path)
+    return f"{os.path.basename(path)}:{st.st_size}:{int(st.st_mtime)}"
+
+
+def sketch_file(input_file, columns=STATS_COLUMNS, batch_size=500000, k=400):
+    """只读取统计列，流式构建单个文件的分位数草图"""
+    parquet_file = pq.ParquetFile(input_file)
+    columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+    sketches = {c: KLLSketch(k=k) for c in columns}
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        for c in columns:
+            sketches[c].update(batch.column(c).to_numpy(zero_copy_only=False))
+    return sketches
+
+
+def summarize(sketches):
+    """由草图得到中位数、四分位数以及IQR异常值边界"""
+    stats = {}
+    for c, sketch in sketches.items():
+        q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        stats[c] = {'count': sketch.n, 'median': median, 'q1': q1, 'q3': q3,
+                    'lower': q1 - 1.5 * iqr, 'upper': q3 + 1.5 * iqr}
+    return stats
+
+
+def load_or_compute_global_stats(files, cache_path, columns=STATS_COLUMNS, k=400):
+    """第一遍扫描：按文件构建草图并缓存，重跑时只补算新增/变化的文件，再合并出全局统计量"""
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f).get('files', {})
+
+    per_file = {}
+    for file in files:
+        key = file_key(file)
+        if key in cache:
+            per_file[key] = {c: KLLSketch.from_dict(d) for c, d in cache[key].items()}
+        else:
+            print(f"正在统计文件: {file}")
+            per_file[key] = sketch_file(file, columns, k=k)
+
+    merged = {c: KLLSketch(k=k) for c in columns}
+    for sketches in per_file.values():
+        for c, sketch in sketches.items():
+            merged[c].merge(sketch)
+    stats = summarize(merged)
+
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({'stats': stats,
+                   'files': {key: {c: s.to_dict() for c, s in sketches.items()}
+                             for key, sketches in per_file.items()}}, f)
+    return stats
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+from functools import partial
+import pandas as pd
+import pyarrow.parquet as pq
+from 数据读取 import list_parquet_files
+from 并行聚合 import map_reduce
+from 结果缓存 import ResultCache, to_frame
+from 部分聚合 import (BinnedCrosstab, BinnedStats, Crosstab, Filtered, GroupedQuantiles, Histogram, Mean,
+                   ValueCounts)
+
+# 分析结果输出目录（每个图表一个 Parquet 文件）
+RESULTS_DIR = 'analysis_results'
+MANIFEST_FILE = '_manifest.json'
+
+AGE_BINS = [0, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+AGE_LABELS = ['0-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '91+']
+AGE_DECADE_BINS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+AGE_DECADE_LABELS = [f"{AGE_DECADE_BINS[i]}-{AGE_DECADE_BINS[i + 1]}" for i in range(len(AGE_DECADE_BINS) - 1)]
+INCOME_BINS = [0, 100000, 200000, 300000, 400000, 500000, 600000,
+               700000, 800000, 900000, 1000000, float('inf')]
+INCOME_LABELS = ['<10万', '10-20万', '20-30万', '30-40万', '40-50万',
+                 '50-60万', '60-70万', '70-80万', '80-90万', '90-100万', '>100万']
+COUNTRY_INCOME_BINS = [i * 100000 for i in range(11)]
+COUNTRY_INCOME_LABELS = [f"{COUNTRY_INCOME_BINS[i] / 1000}k-{COUNTRY_INCOME_BINS[i + 1] / 1000}k"
+                         for i in range(len(COUNTRY_INCOME_BINS) - 1)]
+GENDERS = ['男', '女']
+
+# 注册的分析：名称 -> (对应的图表脚本, 聚合的构造函数)
+# 图表脚本用 load_result(名称, input_dir=数据目录) 取结果，分箱、标签、缺失值处理与脚本原来的计算一致
+ANALYSES = {
+    'country_counts': ('国家分布.py', lambda: ValueCounts('country')),
+    'age_counts': ('年龄分布.py / 统计年龄分布.py', lambda: ValueCounts('age')),
+    'age_groups': ('年龄性别国家分布.py', lambda: Histogram('age', AGE_BINS, AGE_LABELS)),
+    'income_groups': ('统计收入分布.py', lambda: Histogram('income', INCOME_BINS, INCOME_LABELS)),
+    'income_stats': ('年龄性别国家分布.py', lambda: BinnedStats('income', INCOME_BINS, INCOME_LABELS)),
+    'gender_counts': ('性别和省份.py', lambda: ValueCounts('gender', fillna='未指定')),
+    'province_counts': ('性别和省份.py', lambda: ValueCounts('province', fillna='None')),
+    'category_counts': ('年龄性别国家分布.py', lambda: ValueCounts('category')),
+    'country_gender': ('国家和性别分析.py / 各国性别分布.py', lambda: Crosstab('country', 'gender')),
+    'country_income': ('国家和收入.py', lambda: Histogram('income', COUNTRY_INCOME_BINS, COUNTRY_INCOME_LABELS,
+                                                      by='country')),
+    'age_gender': ('年龄和性别.py', lambda: Histogram('age', AGE_DECADE_BINS, AGE_DECADE_LABELS, by='gender')),
+    'age_income': ('年龄性别国家分布.py', lambda: BinnedCrosstab('age', AGE_BINS, 'income', INCOME_BINS,
+                                                           AGE_LABELS, INCOME_LABELS)),
+    'gender_income': ('收入与性别.py', lambda: Mean('income', by='gender')),
+    # 不同省份年收入和消费金额.py 只统计性别为 男/女 的记录
+    'province_income_median': ('不同省份年收入和消费金额.py',
+                               lambda: Filtered(GroupedQuantiles('income', by='province'), 'gender', GENDERS)),
+    'province_price': ('不同省份年收入和消费金额.py',
+                       lambda: Filtered(Mean('average_price', by='province'), 'gender', GENDERS)),
+    # 不同省份的消费类别.py 本身只读取 *5.parquet 的10%抽样，这里是同一交叉表的全量版本
+    'province_category': ('不同省份的消费类别.py（全量）', lambda: Crosstab('province', 'category')),
+    # 两个脚本原来读取旧版预处理输出的 avg_price、categories 列，现在的预处理输出中为 average_price、category
+    'payment_method_price': ('支付方式和平均金额.py / 支付方式和金额.py',
+                             lambda: Mean('average_price', by='payment_method')),
+    'category_payment_status': ('产品种类和订单状态.py', lambda: Crosstab('category', 'payment_status')),
+}
+
+
+def build_aggregates(names):
+    """按名称创建一组聚合（模块级函数，配合 functools.partial 可在子进程中重新创建）"""
+    return {name: ANALYSES[name][1]() for name in names}
+
+
+def available_analyses(files, names=None):
+    """数据中包含所需列的分析；缺少列的分析打印提示后跳过"""
+    schema_names = set(pq.read_schema(files[0]).names) if files else set()
+    selected = []
+    for name in names or ANALYSES:
+        missing = [c for c in ANALYSES[name][1]().columns if c not in schema_names]
+        if missing:
+            print(f"跳过分析 {name}: 数据中没有列 {missing}")
+        else:
+            selected.append(name)
+    return selected
+
+
+def save_results(results, output_dir=RESULTS_DIR, extra=None):
+    """每个分析的结果写成 output_dir/<名称>.parquet，并写出清单（来源脚本、行数等）"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'analyses': {}}
+    manifest.update(extra or {})
+    for name, result in results.items():
+        path = os.path.join(output_dir, f"{name}.parquet")
+        to_frame(result).to_parquet(path)
+        manifest['analyses'][name] = {'source': ANALYSES[name][0], 'file': os.path.basename(path)}
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_result(name, output_dir=RESULTS_DIR, input_dir=None):
+    """读取某个图表的聚合结果（Series 类结果返回 Series）
+    input_dir 不为空时经结果缓存取该数据目录的结果：输入文件和参数都没有变化时直接读取缓存，
+    否则一遍扫描计算所有注册的分析并写入缓存（之后其他图表脚本都直接命中）
+    """
+    if input_dir is not None:
+        results = compute_results(input_dir, cache=ResultCache())
+        if name not in results:
+            raise KeyError(f"{input_dir} 中的数据缺少分析 {name} 需要的列")
+        return results[name]
+    frame = pd.read_parquet(os.path.join(output_dir, f"{name}.parquet"))
+    return frame['value'] if list(frame.columns) == ['value'] else frame
+
+
+def analysis_params(names):
+    """影响结果的分析参数：每项分析的聚合的完整定义（列、分箱边界、标签、fillna、草图的 k、筛选条件等），
+    与输入文件指纹一起组成结果缓存的键，任何一个参数变化都不会命中旧结果
+    """
+    return {name: aggregate.spec() for name, aggregate in build_aggregates(sorted(names)).items()}
+
+
+def compute_results(input_dir='processed_data', names=None, workers=1, batch_size=500000, cache=None,
+                    memory_limit_mb=None):
+    """一遍扫描完成所有注册的分析：每个批次只读取一次（所有分析需要的列的并集），依次交给每个聚合，返回 {名称: 结果}
+    cache 为 ResultCache 时，输入文件和参数都没有变化就直接使用缓存的结果，不再扫描数据；
+    memory_limit_mb 不为空时批次大小在该内存上限以内自适应调整（见 部分聚合.reduce_file）
+    """
+    files = list_parquet_files(input_dir)
+    names = available_analyses(files, names)
+
+    def compute():
+        print(f"共 {len(names)} 项分析, 一遍扫描 {len(files)} 个文件")
+        aggregates = map_reduce(files, partial(build_aggregates, names), workers=workers, batch_size=batch_size,
+                                memory_limit_mb=memory_limit_mb)
+        return {name: aggregate.result() for name, aggregate in aggregates.items()}
+
+    return cache.cached(files, analysis_params(names), compute) if cache is not None else compute()
+
+
+def run_all(input_dir='processed_data', output_dir=RESULTS_DIR, names=None, workers=1, batch_size=500000,
+            cache=None, memory_limit_mb=None):
+    """compute_results 后把每个图表的聚合结果写到 output_dir，绘图脚本用 load_result 读取即可"""
+    results = compute_results(input_dir, names, workers, batch_size, cache, memory_limit_mb)
+    files = list_parquet_files(input_dir)
+    rows = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+    save_results(results, output_dir, extra={'input_dir': input_dir, 'files': len(files), 'rows': rows})
+    print(f"分析结果已保存到 {output_dir}/")
+    return results
+
+
+if __name__ == "__main__":
+    run_all(*sys.argv[1:3], cache=ResultCache())
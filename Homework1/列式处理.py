@@ -0,0 +1,133 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from 批量解析 import decode_purchase_table
+from 时间解析 import TimestampParser
+from 省份解析 import resolve_provinces_array
+
+# 一天的微秒数（时间统一为微秒精度）
+MICROSECONDS_PER_DAY = 86400 * 10 ** 6
+
+
+def fill_median(column, median):
+    """用中位数填充缺失值；与 pandas 一致，含缺失值的整数列先转为 float64"""
+    if median is None or pd.isna(median) or column.null_count == 0:
+        return column
+    if pa.types.is_integer(column.type):
+        column = column.cast(pa.float64())
+    return pc.fill_null(column, median)
+
+
+def floor_days(duration):
+    """微秒时间差向下取整为天数（与 pandas 的 Timedelta.days 一致，负数向负无穷取整）"""
+    values = duration.cast(pa.int64())
+    days = pc.divide(values, MICROSECONDS_PER_DAY)
+    remainder = pc.subtract(values, pc.multiply(days, MICROSECONDS_PER_DAY))
+    return pc.if_else(pc.less(remainder, 0), pc.subtract(days, 1), days)
+
+
+def index_type(n):
+    """与 pandas Categorical 相同的编码宽度"""
+    if n < 127:
+        return pa.int8()
+    if n < 32767:
+        return pa.int16()
+    return pa.int32()
+
+
+def encode_categories(table, all_categories):
+    """按全局字典把分类列编码为 Arrow 字典列（不在字典中的取值置为缺失值）"""
+    for c, categories in all_categories.items():
+        if c not in table.column_names:
+            continue
+        # 与 pandas 引擎（pa.Table.from_pandas）相同，字典取值为 large_string
+        dictionary = pa.array(categories, type=pa.large_string())
+        column = table.column(c).cast(pa.large_string()).combine_chunks()
+        indices = pc.index_in(column, value_set=dictionary)
+        unknown = len(column) - column.null_count - (len(indices) - indices.null_count)
+        if unknown:
+            print(f"警告: 列 {c} 中有 {unknown} 个取值不在全局字典中，已置为缺失值")
+        encoded = pa.DictionaryArray.from_arrays(indices.cast(index_type(len(categories))), dictionary)
+        table = table.set_column(table.schema.get_field_index(c), c, encoded)
+    return table
+
+
+def set_or_append(table, name, column):
+    """替换已有列（保持列位置）或追加新列"""
+    if name in table.column_names:
+        return table.set_column(table.schema.get_field_index(name), name, column)
+    return table.append_column(name, column)
+
+
+def match_pandas_types(table):
+    """使输出与 pandas 引擎写出的表一致：字符串列统一为 large_string，并去掉原始输入文件带来的 schema 元数据
+    （其中的 pandas 元数据记录的是原始列类型，保留会让 pd.read_parquet 把时间列还原为字符串）
+    """
+    for field in table.schema:
+        if pa.types.is_string(field.type):
+            table = table.set_column(table.schema.get_field_index(field.name), field.name,
+                                     table.column(field.name).cast(pa.large_string()))
+    return table.replace_schema_metadata(None)
+
+
+def process_chunk_arrow(batch, all_categories, global_stats=None, time_parser=None):
+    """process_chunk 的 Arrow 实现：全部使用 pyarrow.compute 计算，不转换为 pandas，输出与 pandas 引擎一致"""
+    table = batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+
+    # 转换时间类型并统一时区
+    time_parser = time_parser or TimestampParser()
+    for c in ['timestamp', 'registration_date']:
+        table = set_or_append(table, c, time_parser.parse(c, table.column(c)))
+
+    # 处理JSON字段
+    try:
+        purchase = decode_purchase_table(table.column('purchase_history'))
+        table = table.drop_columns(['purchase_history'])
+        for name in purchase.column_names:
+            table = set_or_append(table, name, purchase.column(name))
+    except Exception as e:
+        print(f"JSON处理错误: {e}")
+        table = set_or_append(table, 'items_count', pa.array([0] * table.num_rows, type=pa.int64()))
+
+    # 处理缺失值（优先使用全局中位数）
+    medians = {}
+    for c in ['age', 'income', 'credit_score']:
+        if global_stats is not None:
+            medians[c] = global_stats[c]['median']
+        else:
+            medians[c] = pc.quantile(table.column(c), q=0.5, interpolation='linear')[0].as_py()
+        table = set_or_append(table, c, fill_median(table.column(c), medians[c]))
+    table = set_or_append(table, 'gender', pc.fill_null(table.column('gender'), '未知'))
+
+    # 年龄、收入IQR、信用分三个条件合并为一个掩码，只做一次过滤
+    age, income, credit = table.column('age'), table.column('income'), table.column('credit_score')
+    age_mask = pc.and_(pc.greater(age, 0), pc.less(age, 120))
+
+    if global_stats is not None:
+        Q1, Q3 = global_stats['income']['q1'], global_stats['income']['q3']
+    else:
+        Q1, Q3 = pc.quantile(income.filter(pc.fill_null(age_mask, False)), q=[0.25, 0.75],
+                             interpolation='linear').to_pylist()
+    mask = age_mask
+    if Q1 is not None and Q3 is not None:
+        IQR = Q3 - Q1
+        outlier = pc.or_(pc.less(income, Q1 - 1.5 * IQR), pc.greater(income, Q3 + 1.5 * IQR))
+        mask = pc.and_(mask, pc.invert(pc.fill_null(outlier, False)))
+    mask = pc.and_(mask, pc.and_(pc.greater_equal(credit, 300), pc.less_equal(credit, 850)))
+    table = table.filter(pc.fill_null(mask, False))
+
+    # 特征工程
+    timestamp = table.column('timestamp')
+    day_of_week = pc.day_of_week(timestamp)
+    table = set_or_append(table, 'province', resolve_provinces_array(table.column('chinese_address')))
+    table = set_or_append(table, 'hour', pc.hour(timestamp))
+    table = set_or_append(table, 'day_of_week', day_of_week)
+    table = set_or_append(table, 'is_weekend',
+                          pc.fill_null(pc.greater_equal(day_of_week, 5), False).cast(pa.int64()))
+
+    # 计算注册时间到当前时间的天数
+    duration = pc.subtract(timestamp, table.column('registration_date'))
+    table = set_or_append(table, 'days_since_registration', floor_days(duration))
+
+    # 分类列使用全局字典编码
+    return match_pandas_types(encode_categories(table, all_categories))
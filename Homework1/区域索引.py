@@ -0,0 +1,122 @@
+import os
+import json
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from 全局统计 import file_key
+from 类别字典 import CATEGORICAL_COLUMNS
+
+# 区域索引文件，放在数据目录下（以下划线开头，不会被当作数据文件读取）
+ZONE_INDEX_FILE = '_zone_index.json'
+
+# 记录取值集合的分类列；取值超过 MAX_DISTINCT 个时只记录为"未知"，不用于跳过
+DISTINCT_COLUMNS = CATEGORICAL_COLUMNS + ['payment_method', 'payment_status']
+MAX_DISTINCT = 256
+
+
+def is_numeric(data_type):
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+
+def is_string(data_type):
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def index_file(path):
+    """为单个 Parquet 文件的每个 row group 记录数值列的 min/max 和分类列的取值集合"""
+    parquet_file = pq.ParquetFile(path)
+    schema = parquet_file.schema_arrow
+    numeric = [f.name for f in schema if is_numeric(f.type)]
+    distinct = [f.name for f in schema if f.name in DISTINCT_COLUMNS and is_string(f.type)]
+    metadata = parquet_file.metadata
+    positions = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+
+    row_groups = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        entry = {'rows': row_group.num_rows, 'min': {}, 'max': {}, 'values': {}}
+        missing = []
+        # 数值列优先使用 Parquet 元数据中的统计信息，不需要读取数据
+        for c in numeric:
+            stats = row_group.column(positions[c]).statistics if c in positions else None
+            if stats is not None and stats.has_min_max:
+                entry['min'][c], entry['max'][c] = stats.min, stats.max
+            else:
+                missing.append(c)
+        if missing or distinct:
+            table = parquet_file.read_row_group(i, columns=missing + distinct)
+            for c in missing:
+                min_max = pc.min_max(table.column(c))
+                entry['min'][c], entry['max'][c] = min_max['min'].as_py(), min_max['max'].as_py()
+            for c in distinct:
+                values = pc.unique(table.column(c).cast(pa.string())).drop_null().to_pylist()
+                entry['values'][c] = sorted(values) if len(values) <= MAX_DISTINCT else None
+        row_groups.append(entry)
+    return {'key': file_key(path), 'rows': metadata.num_rows, 'row_groups': row_groups}
+
+
+def update_zone_index(base_dir, files):
+    """增量更新数据目录的区域索引：只为新增或修改过的文件重新建立索引，删除已不存在的文件，返回索引"""
+    path = os.path.join(base_dir, ZONE_INDEX_FILE)
+    index = {'files': {}}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+
+    entries, changed = {}, False
+    for file in files:
+        name = os.path.relpath(file, base_dir)
+        entry = index['files'].get(name)
+        if entry is None or entry['key'] != file_key(file):
+            print(f"正在建立区域索引: {name}")
+            entry, changed = index_file(file), True
+        entries[name] = entry
+    changed = changed or set(entries) != set(index['files'])
+
+    index = {'files': entries}
+    if changed:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+    return index
+
+
+def may_match(entry, column, op, value):
+    """根据 row group 的统计信息判断条件 (column, op, value) 是否可能有行满足；没有统计信息时返回 True"""
+    values = entry['values'].get(column)
+    if values is not None:
+        values = set(values)
+        if op == '==':
+            return value in values
+        if op == 'in':
+            return bool(values & set(value))
+        if op == '!=':
+            return values != {value}
+        if op == 'not in':
+            return not values <= set(value)
+
+    if column not in entry['min']:
+        return True
+    low, high = entry['min'][column], entry['max'][column]
+    if low is None or high is None:
+        return True
+    if op == '>':
+        return high > value
+    if op == '>=':
+        return high >= value
+    if op == '<':
+        return low < value
+    if op == '<=':
+        return low <= value
+    if op == '==':
+        return low <= value <= high
+    if op == 'in':
+        return any(low <= v <= high for v in value)
+    return True
+
+
+def candidate_row_groups(file_entry, filters):
+    """文件中可能满足全部过滤条件的 row group 编号；filters 为 [(列, 运算符, 值), ...]，条件之间为"且\""""
+    return [i for i, entry in enumerate(file_entry['row_groups'])
+            if entry['rows'] and all(may_match(entry, c, op, v) for c, op, v in filters)]
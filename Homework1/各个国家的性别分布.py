@@ -2,7 +2,7 @@ import os
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from tqdm import tqdm
+from 数据读取 import read_sample
 
 # 设置中文字体
 import matplotlib
@@ -18,19 +18,10 @@ output_directory = 'pictures/ppppp'
 if not os.path.exists(output_directory):
     os.makedirs(output_directory)
 
-# 获取所有 .parquet 文件
-parquet_files = [f for f in os.listdir(input_directory) if f.endswith('4.parquet')]
-
-# 初始化总数据 DataFrame
-all_data = pd.DataFrame()
-
-# 加载数据
-for file in tqdm(parquet_files, desc="加载数据文件", ncols=100):
-    file_path = os.path.join(input_directory, file)
-    df = pd.read_parquet(file_path)
-    all_data = pd.concat([all_data, df], ignore_index=True)
-
-sampled_df = all_data.sample(frac=0.1, random_state=42)  # 0.1% 抽样
+# 读取预处理时写出的10%抽样层级（按 id 哈希抽样，结果可复现），只读取需要的列
+# 与原脚本一样只分析文件名以 4.parquet 结尾的输出文件（预处理合并小文件后，这些文件与原来的批次不再一一对应）
+sampled_df = read_sample(input_directory, 0.1, columns=['country', 'gender'],
+                         files='*4.parquet')
 
 # 生成交叉表
 sample_gender_country = pd.crosstab(sampled_df['country'], sampled_df['gender'])
@@ -1,7 +1,7 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib import font_manager
+from 全量分析 import load_result
 
 # 设置中文字体（Linux）
 myfont = font_manager.FontProperties(fname='/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc')
@@ -9,31 +9,12 @@ plt.rcParams['axes.unicode_minus'] = False
 
 
 def plot_gender_distribution_by_country(input_folder, output_image_path):
-    all_data = []
-
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.parquet'):
-            file_path = os.path.join(input_folder, filename)
-            try:
-                df = pd.read_parquet(file_path, columns=["country", "gender"])
-                all_data.append(df)
-                print(f"✅ Processed: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to process {filename}: {e}")
-
-    if not all_data:
+    # 每个国家各性别数量（全量分析 中的 country_gender，经结果缓存，数据未变化时不再扫描）
+    gender_counts = load_result('country_gender', input_dir=input_folder)
+    if gender_counts.empty:
         print("⚠️ No data collected.")
         return
 
-    # 合并所有数据
-    combined_df = pd.concat(all_data, ignore_index=True)
-
-    # 删除空值
-    combined_df = combined_df.dropna(subset=["country", "gender"])
-
-    # 统计每个国家各性别数量
-    gender_counts = combined_df.groupby(["country", "gender"]).size().unstack(fill_value=0)
-
     # 绘制堆叠柱状图
     plt.figure(figsize=(16, 8))
     bottom = None
@@ -1,36 +1,13 @@
-import os
-import pandas as pd
 import matplotlib.pyplot as plt
-from tqdm import tqdm
+from 全量分析 import load_result
 
 plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # 支持中文显示
 
-def get_all_files(folder_path, suffix=".parquet"):
-    """获取指定文件夹下所有指定后缀的文件路径"""
-    file_paths = []
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith(suffix):
-                file_paths.append(os.path.join(root, file))
-    return file_paths
-
 def analyze_country_distribution(folder_path):
-    """分析国家分布"""
-    files = get_all_files(folder_path)
-    all_countries = []
-
-    for file in tqdm(files, desc="分析国家分布中"):
-        try:
-            df = pd.read_parquet(file, columns=['country'], engine='pyarrow')
-            all_countries.extend(df['country'].dropna().astype(str).tolist())
-        except Exception as e:
-            print(f"读取文件出错 {file}: {e}")
-            continue
-
-    if all_countries:
-        country_series = pd.Series(all_countries)
-        country_counts = country_series.value_counts()
+    """分析国家分布：取 全量分析 中 country_counts 的结果（经结果缓存，数据未变化时不再扫描）"""
+    country_counts = load_result('country_counts', input_dir=folder_path)
 
+    if not country_counts.empty:
         # 只显示前20个国家（如国家种类太多）
         top_countries = country_counts.head(20)
 
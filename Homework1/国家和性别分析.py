@@ -2,6 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+from 全量分析 import load_result
 
 # 设置中文显示
 plt.rcParams['font.sans-serif'] = ['SimHei']
@@ -9,30 +10,9 @@ plt.rcParams['axes.unicode_minus'] = False
 
 
 def process_all_files(folder_path):
-    """处理文件夹下所有Parquet文件"""
-    all_gender_counts = pd.DataFrame()
-
-    # 遍历文件夹
-    for file in os.listdir(folder_path):
-        if file.endswith('.parquet'):
-            file_path = os.path.join(folder_path, file)
-            try:
-                # 读取单个文件
-                df = pd.read_parquet(file_path)
-
-                # 统计当前文件的性别分布
-                gender_counts = df.groupby(['country', 'gender']).size().unstack()
-                all_gender_counts = pd.concat([all_gender_counts, gender_counts])
-
-                print(f"已处理文件: {file}")
-            except Exception as e:
-                print(f"处理文件 {file} 时出错: {str(e)}")
-                continue
-
-    # 合并所有文件的统计结果
-    if not all_gender_counts.empty:
-        # 按国家分组求和
-        final_counts = all_gender_counts.groupby('country').sum()
+    """各国的性别计数（全量分析 中的 country_gender，经结果缓存，数据未变化时不再扫描），返回用户数最多的前20个国家"""
+    final_counts = load_result('country_gender', input_dir=folder_path)
+    if not final_counts.empty:
         # 筛选前20国家
         top_countries = final_counts.sum(axis=1).sort_values(ascending=False).head(20).index
         return final_counts.loc[top_countries]
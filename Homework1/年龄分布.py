@@ -1,39 +1,18 @@
-import os
 import pandas as pd
 import matplotlib.pyplot as plt
-from tqdm import tqdm
+from 全量分析 import load_result
 
 plt.rcParams['font.sans-serif'] = ['Microsoft YaHei']  # 中文字体支持
 pd.set_option('display.max_columns', None)
 
 
-def get_all_files(folder_path, suffix=".parquet"):
-    """获取所有指定后缀的文件路径"""
-    file_paths = []
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith(suffix):
-                file_paths.append(os.path.join(root, file))
-    return file_paths
-
-
 def analyze_age_distribution(folder_path):
-    """分析年龄分布，仅提取 age 列，节省内存"""
-    files = get_all_files(folder_path)
-    all_ages = []
-
-    for file in tqdm(files, desc="分析年龄分布中"):
-        try:
-            df = pd.read_parquet(file, columns=['age'], engine='pyarrow')
-            all_ages.extend(df['age'].dropna().astype(int).tolist())
-        except Exception as e:
-            print(f"读取文件出错 {file}: {e}")
-            continue
+    """分析年龄分布：取 全量分析 中 age_counts 的结果（经结果缓存，数据未变化时不再扫描）"""
+    age_counts = load_result('age_counts', input_dir=folder_path)
 
-    if all_ages:
-        age_series = pd.Series(all_ages)
+    if not age_counts.empty:
         plt.figure(figsize=(10, 6))
-        ax = age_series.value_counts().sort_index().plot(
+        ax = age_counts.sort_index().plot(
             kind='bar',
             color='lightgreen',
             edgecolor='black'
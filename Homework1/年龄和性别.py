@@ -1,23 +1,21 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+from 全量分析 import load_result
 
 # 设置中文显示
 plt.rcParams['font.sans-serif'] = ['SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
-# 1. 读取数据
-df = pd.read_parquet("10G_data/part-00000.parquet")
+# 1. 各年龄段（0-100岁每10岁一段）的性别数量：全量分析 中的 age_gender（性别 × 年龄段），
+#    经结果缓存，数据未变化时不再扫描；原来只读取 part-00000.parquet 一个文件，现在统计整个目录
+age_gender = load_result('age_gender', input_dir='10G_data')
 
-# 2. 创建年龄段分组
-age_bins = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
-age_labels = []
-for i in range(len(age_bins) - 1):
-    age_labels.append(str(age_bins[i]) + "-" + str(age_bins[i + 1]))
-df['age_group'] = pd.cut(df['age'], bins=age_bins, labels=age_labels)
+# 2. 年龄段标签
+age_labels = list(age_gender.columns)
 
 # 3. 统计各年龄段的性别数量
-gender_counts = df.groupby(['age_group', 'gender']).size().unstack()
+gender_counts = age_gender.T
 
 # 4. 绘制并排柱状图
 plt.figure(figsize=(12, 6))
@@ -54,13 +52,13 @@ plt.legend(title='性别')
 # 6. 添加柱子数值标签
 for i in x:
     plt.text(
-        i - bar_width / 2, gender_counts['男'][i] + 5,
-        str(gender_counts['男'][i]),
+        i - bar_width / 2, gender_counts['男'].iloc[i] + 5,
+        str(gender_counts['男'].iloc[i]),
         ha='center', va='bottom'
     )
     plt.text(
-        i + bar_width / 2, gender_counts['女'][i] + 5,
-        str(gender_counts['女'][i]),
+        i + bar_width / 2, gender_counts['女'].iloc[i] + 5,
+        str(gender_counts['女'].iloc[i]),
         ha='center', va='bottom'
     )
 
@@ -2,7 +2,7 @@ import os
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from tqdm import tqdm  # 导入tqdm库
+from 数据读取 import read_sample
 from sklearn.cluster import KMeans  # 导入KMeans聚类算法
 
 # 设置中文字体
@@ -19,25 +19,13 @@ output_directory = 'pictures/ppppp'  # 设置保存图片的文件夹路径
 if not os.path.exists(output_directory):
     os.makedirs(output_directory)
 
-# 遍历所有parquet文件，加载数据
-parquet_files = [f for f in os.listdir(input_directory) if f.endswith('4.parquet')]
+# 读取预处理时写出的0.01%抽样层级（按 id 哈希抽样，结果可复现），只读取需要的列
+# 与原脚本一样只分析文件名以 4.parquet 结尾的输出文件（预处理合并小文件后，这些文件与原来的批次不再一一对应）
+sampled_df = read_sample(input_directory, 0.0001, columns=['age', 'average_price'],
+                         files='*4.parquet')
 
-# 初始化空的DataFrame来存储所有数据
-all_data = pd.DataFrame()
-
-# 使用tqdm显示进度条加载数据
-for file in tqdm(parquet_files, desc="加载文件", ncols=100):
-    file_path = os.path.join(input_directory, file)
-    df = pd.read_parquet(file_path)
-
-    # 将数据追加到all_data中
-    all_data = pd.concat([all_data, df], ignore_index=True)
-
-# 处理数据：从全部数据中抽样（例如，抽取0.01%的数据）
-sampled_df = all_data.sample(frac=0.0001, random_state=42)  # 0.01%的抽样，random_state保证重复性
-
-# 将年龄字段的值扩大10倍
-sampled_df['age'] = sampled_df['age'] * 10
+# 将年龄字段的值扩大10倍（预处理输出的 age 为 int8，先转为 int16 再相乘，避免溢出回绕）
+sampled_df['age'] = sampled_df['age'].astype('int16') * 10
 
 # 提取需要进行聚类的特征（年龄和消费金额）
 data_for_clustering = sampled_df[['age', 'average_price']].dropna()
@@ -2,9 +2,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from glob import glob
-import gc
-from tqdm import tqdm
 import os
+from 并行聚合 import map_reduce
+from 部分聚合 import BinnedCrosstab, BinnedStats, Histogram, ValueCounts
 
 # 设置中文显示
 plt.rcParams['font.sans-serif'] = ['SimHei']
@@ -15,68 +15,45 @@ if not os.path.exists('pictures'):
     os.makedirs('pictures')
 
 
-def load_data(file_pattern, chunk_size=10):
-    files = glob(file_pattern)
-    for i in tqdm(range(0, len(files), chunk_size), desc="读取进度"):
-        for file in files[i:i + chunk_size]:
-            df = pd.read_parquet(file)
-            yield df
-            del df
-            gc.collect()
+# 基于实际数据调整的分段设置
+AGE_BINS = [0, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+AGE_LABELS = ['0-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '91+']
 
+# 修改为每10万元一个分点
+INCOME_BINS = [0, 100000, 200000, 300000, 400000, 500000, 600000,
+               700000, 800000, 900000, 1000000, float('inf')]
+INCOME_LABELS = ['<10万', '10-20万', '20-30万', '30-40万', '40-50万',
+                 '50-60万', '60-70万', '70-80万', '80-90万', '90-100万', '>100万']
 
-def analyze_data(file_pattern='processed_data/*.parquet'):
-    """执行数据分析"""
-    # 初始化结果容器
-    age_counts = pd.Series(dtype='int64')
-    gender_counts = pd.Series(dtype='int64')
-    country_counts = pd.Series(dtype='int64')
-    income_stats = []
-    category_stats = pd.Series(dtype='int64')
-    province_counts = pd.Series(dtype='int64')
-    age_income_data = []
 
-    # 基于实际数据调整的分段设置
-    age_bins = [0, 20, 30, 40, 50, 60, 70, 80, 90, 100]
-    age_labels = ['0-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '91+']
-
-    # 修改为每10万元一个分点
-    income_bins = [0, 100000, 200000, 300000, 400000, 500000, 600000,
-                   700000, 800000, 900000, 1000000, float('inf')]
-    income_labels = ['<10万', '10-20万', '20-30万', '30-40万', '40-50万',
-                     '50-60万', '60-70万', '70-80万', '80-90万', '90-100万', '>100万']
-
-    # 处理数据（保持不变）
-    for df in load_data(file_pattern, chunk_size=10):
-        # 1. 年龄分析
-        df['age_group'] = pd.cut(df['age'], bins=age_bins, labels=age_labels)
-        age_counts = age_counts.add(df['age_group'].value_counts(), fill_value=0)
-
-        # 2. 性别分析
-        gender_counts = gender_counts.add(df['gender'].value_counts(), fill_value=0)
-
-        # 3. 国家分析
-        country_counts = country_counts.add(df['country'].value_counts(), fill_value=0)
-
-        # 4. 收入分析（使用新的分段设置）
-        df['income_group'] = pd.cut(df['income'], bins=income_bins, labels=income_labels)
-        income_stats.append(df.groupby('income_group', observed=False)['income'].describe())
-
-        # 5. 消费类别分析
-        category_stats = category_stats.add(df['category'].value_counts(), fill_value=0)
-
-        # 6. 省份分析
-        province_counts = province_counts.add(df['province'].value_counts(), fill_value=0)
-
-        # 7. 年龄与收入关系分析
-        df['income_group'] = pd.cut(df['income'], bins=income_bins, labels=income_labels)
-        df['age_group'] = pd.cut(df['age'], bins=age_bins, labels=age_labels)
-        age_income_data.append(pd.crosstab(df['age_group'], df['income_group'], normalize='index'))
+def make_aggregates():
+    """每个文件归约得到的部分结果（模块级函数，子进程中重新创建）"""
+    return {
+        'age_counts': Histogram('age', AGE_BINS, AGE_LABELS),
+        'gender_counts': ValueCounts('gender'),
+        'country_counts': ValueCounts('country'),
+        # 4. 收入分析（使用新的分段设置）：按分箱累计计数、均值、方差、最值和分位数草图
+        'income_stats': BinnedStats('income', INCOME_BINS, INCOME_LABELS),
+        'category_stats': ValueCounts('category'),
+        'province_counts': ValueCounts('province'),
+        # 7. 年龄与收入关系分析：累计原始计数，最后再按行归一化
+        'age_income_data': BinnedCrosstab('age', AGE_BINS, 'income', INCOME_BINS, AGE_LABELS, INCOME_LABELS),
+    }
 
-        del df
-        gc.collect()
 
-    # 其余代码保持不变...
+def analyze_data(file_pattern='processed_data/*.parquet', workers=None, batch_size=500000, memory_limit_mb=2048):
+    """执行数据分析：进程池中逐个文件归约，按文件顺序合并（workers 为进程数，默认使用全部CPU）
+    每个进程的批次大小从 batch_size 开始，在 memory_limit_mb 以内自适应调整
+    """
+    aggregates = map_reduce(sorted(glob(file_pattern)), make_aggregates, workers=workers, batch_size=batch_size,
+                            memory_limit_mb=memory_limit_mb)
+    age_counts = aggregates['age_counts'].result()
+    gender_counts = aggregates['gender_counts'].result()
+    country_counts = aggregates['country_counts'].result()
+    income_combined = aggregates['income_stats'].result()
+    category_stats = aggregates['category_stats'].result()
+    province_counts = aggregates['province_counts'].result()
+    age_income_combined = aggregates['age_income_data'].result(normalize='index')
 
     # 可视化分析结果 --------------------------------------------------
 
@@ -118,8 +95,7 @@ def analyze_data(file_pattern='processed_data/*.parquet'):
     plt.close()
 
     # 4. 收入分布
-    if income_stats:
-        income_combined = pd.concat(income_stats).groupby(level=0, observed=False).mean()
+    if income_combined['count'].sum() > 0:
         plt.figure(figsize=(12, 6))
         income_combined['count'].plot(kind='bar', color='#8c564b')
         plt.title('用户收入分布', fontsize=15)
@@ -159,8 +135,7 @@ def analyze_data(file_pattern='processed_data/*.parquet'):
         plt.close()
 
     # 7. 年龄与收入关系热力图
-    if age_income_data:
-        age_income_combined = sum(age_income_data) / len(age_income_data)
+    if not age_income_combined.empty:
         plt.figure(figsize=(12, 8))
         sns.heatmap(age_income_combined, cmap='YlOrRd', annot=True, fmt='.1%', cbar_kws={'label': '占比'})
         plt.title('不同年龄段用户的收入分布', fontsize=15)
@@ -174,23 +149,24 @@ def analyze_data(file_pattern='processed_data/*.parquet'):
         'age_distribution': age_counts,
         'gender_distribution': gender_counts,
         'country_distribution': country_counts,
-        'income_distribution': income_combined if income_stats else None,
+        'income_distribution': income_combined,
         'category_distribution': category_stats,
         'province_distribution': province_counts
     }
 
 
 # 执行分析
-results = analyze_data()
-
-# 打印统计结果
-print("=== 年龄分布统计 ===")
-print(results['age_distribution'])
-print("\n=== 性别分布统计 ===")
-print(results['gender_distribution'])
-print("\n=== Top 5国家分布 ===")
-print(results['country_distribution'].nlargest(5))
-print("\n=== 消费类别分布 ===")
-print(results['category_distribution'])
-print("\n=== Top 5省份分布 ===")
-print(results['province_distribution'].nlargest(5))
+if __name__ == "__main__":
+    results = analyze_data()
+
+    # 打印统计结果
+    print("=== 年龄分布统计 ===")
+    print(results['age_distribution'])
+    print("\n=== 性别分布统计 ===")
+    print(results['gender_distribution'])
+    print("\n=== Top 5国家分布 ===")
+    print(results['country_distribution'].nlargest(5))
+    print("\n=== 消费类别分布 ===")
+    print(results['category_distribution'])
+    print("\n=== Top 5省份分布 ===")
+    print(results['province_distribution'].nlargest(5))
@@ -0,0 +1,165 @@
+import os
+import gc
+import time
+import psutil
+import pyarrow.parquet as pq
+from multiprocessing import Pool
+from collections import defaultdict
+from 列式处理 import process_chunk_arrow
+from 时间解析 import TimestampParser
+from 数据写出 import make_writer, BATCHES_PER_FILE
+from 输出模式 import SchemaViolation
+from 预处理流水线 import PIPELINE_SPEC, plan_file_groups, scan_row_groups
+from 自适应批次 import AdaptiveBatchController, adaptive_batches
+
+# 处理时数据在内存中的膨胀倍数（Arrow -> pandas -> JSON展开 -> 写出）
+EXPANSION_FACTOR = 4
+
+
+def mem_usage():
+    """返回当前进程内存使用量(MB)"""
+    return psutil.Process().memory_info().rss / (1024 ** 2)
+
+
+def estimate_row_bytes(input_file):
+    """根据Parquet元数据估算每行解压后的字节数"""
+    metadata = pq.ParquetFile(input_file).metadata
+    total_bytes = sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+    return total_bytes / max(metadata.num_rows, 1)
+
+
+def plan_tasks(files, chunk_size=50000, memory_budget_mb=2048, batches_per_file=BATCHES_PER_FILE):
+    """按输出文件切分任务（每个任务是一组 row group，恰好产生一个输出文件），并根据单进程内存预算确定批次大小"""
+    tasks = []
+    for file in files:
+        batch_mb = estimate_row_bytes(file) * chunk_size * EXPANSION_FACTOR / (1024 ** 2)
+        batch_size = chunk_size
+        if batch_mb > memory_budget_mb:
+            batch_size = max(1000, int(chunk_size * memory_budget_mb / batch_mb))
+            print(f"警告: {file} 单个批次预计需要 {batch_mb:.0f} MB，超过单进程内存预算 {memory_budget_mb} MB，"
+                  f"批次大小调整为 {batch_size} 行")
+        for file_index, row_groups in enumerate(plan_file_groups(file, chunk_size * batches_per_file)):
+            tasks.append((file, file_index, row_groups, batch_size))
+    return tasks
+
+
+def _run_task(args):
+    """进程池中执行的单个任务，返回本进程的吞吐统计"""
+    (input_file, output_dir, all_categories, process_chunk, file_index, row_groups, batch_size,
+     memory_budget_mb, global_stats, writer_options, spec, partition_keys, adaptive, engine,
+     sample_tiers) = args
+    start_time = time.time()
+    rows_in = rows_out = batches = 0
+    skipped_batches = skipped_rows = 0
+    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    writer = make_writer(output_dir, base_name, writer_options, partition_keys, sample_tiers)
+    time_parser = TimestampParser()
+
+    stream = scan_row_groups(input_file, row_groups, spec, global_stats, batch_size)
+    if adaptive:
+        stream = adaptive_batches(stream, AdaptiveBatchController(memory_budget_mb, initial_size=batch_size,
+                                                                  verbose=False))
+    try:
+        for batch in stream:
+            batches += 1
+            rows_in += batch.num_rows
+            df = processed_df = None
+            try:
+                if engine == 'arrow':
+                    processed_df = process_chunk_arrow(batch, all_categories, global_stats, time_parser)
+                else:
+                    df = batch.to_pandas()
+                    processed_df = process_chunk(df, all_categories, global_stats, time_parser)
+                writer.write(file_index, processed_df)
+                rows_out += len(processed_df)
+            except SchemaViolation:
+                # 输出列超出允许范围说明清洗逻辑有误，直接中止（异常经进程池传回主进程），不能静默丢弃整个批次
+                raise
+            except Exception as e:
+                skipped_batches += 1
+                skipped_rows += batch.num_rows
+                print(f"处理 {input_file} 第 {file_index} 组批次 {batches} 时出错，跳过 {batch.num_rows} 行: {e}")
+            finally:
+                del df, processed_df
+                gc.collect()
+
+            if mem_usage() > memory_budget_mb:
+                print(f"警告: 进程 {os.getpid()} 内存使用 {mem_usage():.2f} MB 超过预算 {memory_budget_mb} MB")
+    finally:
+        summary = writer.close()
+
+    return {
+        'pid': os.getpid(),
+        'file': input_file,
+        'batches': batches,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'skipped_batches': skipped_batches,
+        'skipped_rows': skipped_rows,
+        'seconds': time.time() - start_time,
+        'time_parser': time_parser,
+        'summary': summary,
+    }
+
+
+def report_throughput(stats, wall_seconds):
+    """打印每个工作进程的吞吐量、时间列解析耗时以及整体吞吐量"""
+    per_worker = defaultdict(lambda: {'tasks': 0, 'rows_in': 0, 'rows_out': 0, 'seconds': 0.0})
+    for s in stats:
+        w = per_worker[s['pid']]
+        w['tasks'] += 1
+        w['rows_in'] += s['rows_in']
+        w['rows_out'] += s['rows_out']
+        w['seconds'] += s['seconds']
+
+    print("各工作进程吞吐量:")
+    for pid, w in sorted(per_worker.items()):
+        rate = w['rows_in'] / w['seconds'] if w['seconds'] > 0 else 0
+        print(f"  进程 {pid}: 任务 {w['tasks']} 个, 输入 {w['rows_in']} 行, 输出 {w['rows_out']} 行, "
+              f"耗时 {w['seconds']:.1f} 秒, {rate:,.0f} 行/秒")
+
+    time_parser = TimestampParser()
+    for s in stats:
+        time_parser.merge(s['time_parser'])
+    print("时间列解析（所有进程合计）:")
+    time_parser.report()
+
+    total_rows = sum(w['rows_in'] for w in per_worker.values())
+    print(f"总计: {total_rows} 行, 墙钟时间 {wall_seconds:.1f} 秒, "
+          f"{total_rows / max(wall_seconds, 1e-9):,.0f} 行/秒")
+    return dict(per_worker)
+
+
+def process_files_parallel(files, output_dir, all_categories, process_chunk, workers=None,
+                           memory_budget_mb=2048, chunk_size=50000, global_stats=None,
+                           batches_per_file=BATCHES_PER_FILE, writer_options=None, spec=PIPELINE_SPEC,
+                           partition_keys=None, adaptive=False, engine='pandas', sample_tiers=None):
+    """使用进程池并行处理所有文件，输出文件与串行处理完全一致，返回输出文件汇总"""
+    workers = workers or os.cpu_count()
+    tasks = plan_tasks(files, chunk_size, memory_budget_mb, batches_per_file)
+    print(f"共 {len(files)} 个文件, 拆分为 {len(tasks)} 个任务, 使用 {workers} 个进程")
+
+    args = [(file, output_dir, all_categories, process_chunk, file_index, row_groups, batch_size,
+             memory_budget_mb, global_stats, writer_options, spec, partition_keys, adaptive, engine, sample_tiers)
+            for file, file_index, row_groups, batch_size in tasks]
+
+    start_time = time.time()
+    stats = []
+    # 每个子进程处理一定数量任务后重启，避免内存碎片持续累积
+    with Pool(processes=workers, maxtasksperchild=20) as pool:
+        for s in pool.imap_unordered(_run_task, args):
+            stats.append(s)
+            print(f"完成 {os.path.basename(s['file'])} 批次 {s['batches']} 个 "
+                  f"({len(stats)}/{len(tasks)}), 进程 {s['pid']}")
+
+    # 与串行处理相同，按输入文件汇总跳过的批次和行数
+    skipped = defaultdict(lambda: [0, 0])
+    for s in stats:
+        skipped[s['file']][0] += s['skipped_batches']
+        skipped[s['file']][1] += s['skipped_rows']
+    for input_file, (skipped_batches, skipped_rows) in sorted(skipped.items()):
+        if skipped_batches:
+            print(f"⚠️ {input_file}: 共跳过 {skipped_batches} 个出错的批次, {skipped_rows} 行")
+
+    report_throughput(stats, time.time() - start_time)
+    return [entry for s in stats for entry in s['summary']]
@@ -0,0 +1,65 @@
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+import pyarrow.parquet as pq
+from 部分聚合 import merge_all, reduce_file
+
+
+def _reduce_task(args):
+    """子进程中把一个文件归约为部分聚合状态"""
+    path, make_aggregates, frac, batch_size, memory_limit_mb = args
+    start = time.time()
+    aggregates = reduce_file(path, make_aggregates, frac=frac, batch_size=batch_size, memory_limit_mb=memory_limit_mb)
+    return {'file': path, 'pid': os.getpid(), 'rows': pq.ParquetFile(path).metadata.num_rows,
+            'seconds': time.time() - start, 'aggregates': aggregates}
+
+
+def map_reduce(files, make_aggregates, workers=None, frac=None, batch_size=500000, memory_limit_mb=None):
+    """用进程池对每个文件执行 reduce_file，再按文件顺序合并部分状态，返回合并后的聚合状态
+    make_aggregates 必须是模块级函数（子进程中需要序列化）；合并顺序固定，结果与串行归约完全一致，
+    workers 为 1 时不启动进程池；memory_limit_mb 为每个进程的内存上限，不为空时批次大小自适应调整（见 reduce_file）
+    """
+    workers = workers or os.cpu_count()
+    args = [(path, make_aggregates, frac, batch_size, memory_limit_mb) for path in files]
+    print(f"共 {len(files)} 个文件, 使用 {workers} 个进程归约")
+
+    start_time = time.time()
+    total = make_aggregates()
+    stats = []
+
+    def consume(results):
+        for s in results:
+            merge_all(total, s.pop('aggregates'))
+            stats.append(s)
+            print(f"完成 {os.path.basename(s['file'])} ({len(stats)}/{len(files)}), 进程 {s['pid']}")
+
+    if workers <= 1:
+        consume(map(_reduce_task, args))
+    else:
+        # imap 按提交顺序返回结果：先完成的文件在前序文件合并后立即合并，合并顺序与文件顺序一致
+        with Pool(processes=workers) as pool:
+            consume(pool.imap(_reduce_task, args))
+
+    report_reduce_throughput(stats, time.time() - start_time)
+    return total
+
+
+def report_reduce_throughput(stats, wall_seconds):
+    """打印每个工作进程的吞吐量和整体吞吐量"""
+    per_worker = defaultdict(lambda: {'files': 0, 'rows': 0, 'seconds': 0.0})
+    for s in stats:
+        w = per_worker[s['pid']]
+        w['files'] += 1
+        w['rows'] += s['rows']
+        w['seconds'] += s['seconds']
+
+    print("各工作进程吞吐量:")
+    for pid, w in sorted(per_worker.items()):
+        rate = w['rows'] / w['seconds'] if w['seconds'] > 0 else 0
+        print(f"  进程 {pid}: 文件 {w['files']} 个, {w['rows']} 行, 耗时 {w['seconds']:.1f} 秒, {rate:,.0f} 行/秒")
+
+    total_rows = sum(w['rows'] for w in per_worker.values())
+    print(f"总计: {total_rows} 行, 墙钟时间 {wall_seconds:.1f} 秒, "
+          f"{total_rows / max(wall_seconds, 1e-9):,.0f} 行/秒")
+    return dict(per_worker)
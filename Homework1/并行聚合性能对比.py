@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import pandas as pd
+import pyarrow.parquet as pq
+from 数据读取 import list_parquet_files
+from 并行聚合 import map_reduce
+from 部分聚合 import Histogram, Mean, ValueCounts, results
+
+AGE_BINS = [0, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+
+
+def make_aggregates():
+    """与 年龄性别国家分布.analyze_data 相同类型的计数与分组统计"""
+    return {
+        'age': Histogram('age', AGE_BINS),
+        'gender': ValueCounts('gender'),
+        'country': ValueCounts('country'),
+        'category': ValueCounts('category'),
+        'province': ValueCounts('province'),
+        'province_income': Mean('income', by='province'),
+    }
+
+
+def assert_same(a, b):
+    for name in a:
+        if isinstance(a[name], pd.DataFrame):
+            pd.testing.assert_frame_equal(a[name], b[name])
+        else:
+            pd.testing.assert_series_equal(a[name], b[name])
+
+
+def main(input_dir='30processed_data', worker_counts=None):
+    """依次用 1、2、4 … 个进程归约同一批文件：检查结果与串行完全一致，打印吞吐量和加速比"""
+    files = list_parquet_files(input_dir)
+    rows = sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count()})
+    timing = {}
+    expected = None
+    for workers in worker_counts:
+        start = time.time()
+        result = results(map_reduce(files, make_aggregates, workers=workers))
+        timing[workers] = time.time() - start
+        if expected is None:
+            expected = result
+        else:
+            assert_same(expected, result)
+
+    print(f"共 {len(files)} 个文件, {rows} 行, 各进程数结果一致")
+    for workers, seconds in timing.items():
+        print(f"  {workers} 个进程: {seconds:.2f} 秒, {rows / max(seconds, 1e-9):,.0f} 行/秒, "
+              f"加速 {timing[worker_counts[0]] / max(seconds, 1e-9):.2f}x")
+    return timing
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
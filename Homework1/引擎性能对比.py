@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import importlib.util
+from itertools import islice
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from 全局统计 import load_or_compute_global_stats
+from 列式处理 import process_chunk_arrow
+from 输出模式 import enforce_schema
+from 预处理流水线 import PIPELINE_SPEC, plan_file_groups, scan_row_groups
+
+
+def load_preprocess(path='10G数据预处理.py'):
+    """加载预处理脚本（文件名以数字开头，不能直接 import）"""
+    spec = importlib.util.spec_from_file_location('预处理', os.path.join(os.path.dirname(__file__), path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def iter_batches(files, chunk_size, global_stats):
+    """按预处理流水线的方式扫描所有文件，逐个返回 (文件名, 批次)"""
+    for file in files:
+        for row_groups in plan_file_groups(file, chunk_size):
+            for batch in scan_row_groups(file, row_groups, PIPELINE_SPEC, global_stats, chunk_size):
+                yield file, batch
+
+
+def run_pandas(batch, process_chunk, all_categories, global_stats):
+    df = process_chunk(batch.to_pandas(), all_categories, global_stats)
+    return enforce_schema(pa.Table.from_pandas(df, preserve_index=False))
+
+
+def run_arrow(batch, all_categories, global_stats):
+    return enforce_schema(process_chunk_arrow(batch, all_categories, global_stats))
+
+
+def read_back(table):
+    """写成 Parquet 后再用 pd.read_parquet 读回：比较读者实际看到的 DataFrame（含 schema 元数据决定的 dtype）"""
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return pd.read_parquet(pa.BufferReader(sink.getvalue()))
+
+
+def main(input_dir='10G_data/', output_dir='processed_data/', chunk_size=50000, max_batches=20):
+    """在相同批次上分别运行 pandas 与 Arrow 两种 process_chunk，检查输出一致并比较吞吐量"""
+    preprocess = load_preprocess()
+    files = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir)
+                   if f.startswith('part-') and f.endswith('.parquet'))
+    all_categories = preprocess.get_all_categories(input_dir, os.path.join(output_dir, 'categories.json'))
+    global_stats = load_or_compute_global_stats(files, os.path.join(output_dir, 'global_stats.json'))
+
+    timing = {'pandas': 0.0, 'arrow': 0.0}
+    rows = batches = 0
+    for file, batch in islice(iter_batches(files, chunk_size, global_stats), max_batches):
+        start = time.perf_counter()
+        expected = run_pandas(batch, preprocess.process_chunk, all_categories, global_stats)
+        timing['pandas'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = run_arrow(batch, all_categories, global_stats)
+        timing['arrow'] += time.perf_counter() - start
+
+        # Arrow 类型和写出后 pd.read_parquet 读到的列、dtype、取值都必须相同
+        if not result.schema.equals(expected.schema):
+            raise AssertionError(f"{file} 第 {batches + 1} 个批次两种引擎的输出类型不一致:\n"
+                                 f"{expected.schema}\n{result.schema}")
+        try:
+            pd.testing.assert_frame_equal(read_back(expected), read_back(result))
+        except AssertionError as e:
+            raise AssertionError(f"{file} 第 {batches + 1} 个批次两种引擎读回的数据不一致: {e}")
+        rows += batch.num_rows
+        batches += 1
+
+    print(f"共 {batches} 个批次, {rows} 行, 两种引擎输出一致")
+    for engine, seconds in timing.items():
+        print(f"  {engine:>6}: {seconds:.2f} 秒, {rows / max(seconds, 1e-9):,.0f} 行/秒")
+    print(f"Arrow 引擎加速比: {timing['pandas'] / max(timing['arrow'], 1e-9):.2f}x")
+    return timing
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -4,10 +4,10 @@ import seaborn as sns
 from sklearn.preprocessing import LabelEncoder
 from mlxtend.frequent_patterns import apriori, association_rules
 import numpy as np
-import gc
-from tqdm import tqdm
 import os
 from glob import glob
+from 并行聚合 import map_reduce
+from 部分聚合 import PerChunk
 
 # 设置中文显示
 plt.rcParams['font.sans-serif'] = ['SimHei']
@@ -18,17 +18,6 @@ if not os.path.exists('pictures'):
     os.makedirs('pictures')
 
 
-# 定义加载数据函数
-def load_data(file_pattern, chunk_size=10):
-    files = glob(file_pattern)
-    for i in tqdm(range(0, len(files), chunk_size), desc="读取进度"):
-        for file in files[i:i + chunk_size]:
-            df = pd.read_parquet(file)
-            yield df
-            del df
-            gc.collect()
-        break
-
 def gender_category_association(df):
     # 只处理 '男' 和 '女'，其他值设置为 NaN
     df['gender'] = df['gender'].apply(lambda x: x if x in ['男', '女'] else None)
@@ -75,25 +64,28 @@ def province_vs_income(df):
     return top_provinces
 
 
-# 执行数据分析
-def analyze_data(file_pattern='processed_data/*.parquet'):
-    """执行数据分析"""
-    gender_category_rules = []
-    age_spending_data = []
-    province_income_data = []
-
-    for df in load_data(file_pattern, chunk_size=10):
+def make_aggregates():
+    """每块数据上的三项分析结果，按文件顺序保留（模块级函数，子进程中重新创建）"""
+    return {
         # 1. 性别与消费类别关联规则
-        gender_category_rules.append(gender_category_association(df))
-
+        'gender_category_rules': PerChunk(gender_category_association, ['gender', 'category']),
         # 2. 年龄与消费金额关系
-        age_spending_data.append(age_vs_spending(df))
-
+        'age_spending_data': PerChunk(age_vs_spending, ['age', 'average_price']),
         # 3. 地区与收入关系
-        province_income_data.append(province_vs_income(df))
+        'province_income_data': PerChunk(province_vs_income, ['province', 'income']),
+    }
 
-        del df
-        gc.collect()
+
+# 执行数据分析
+def analyze_data(file_pattern='processed_data/*.parquet', max_files=10, workers=None, batch_size=500000):
+    """执行数据分析：与原来一样只分析前 max_files 个文件，进程池中逐个文件计算，按文件顺序合并
+    三项分析都在每块数据上单独计算，batch_size 即每块的行数，结果随它变化，因此不使用自适应批次
+    """
+    files = sorted(glob(file_pattern))[:max_files]
+    aggregates = map_reduce(files, make_aggregates, workers=workers, batch_size=batch_size)
+    gender_category_rules = aggregates['gender_category_rules'].result()
+    age_spending_data = aggregates['age_spending_data'].result()
+    province_income_data = aggregates['province_income_data'].result()
 
     # 处理关联规则结果
     gender_category_associations = pd.concat(gender_category_rules, ignore_index=True)
@@ -146,12 +138,13 @@ def analyze_data(file_pattern='processed_data/*.parquet'):
 
 
 # 执行分析
-results = analyze_data()
-
-# 打印统计结果
-print("=== 性别与消费类别的关联规则 ===")
-print(results['gender_category_associations'].head())
-print("\n=== 年龄与消费金额的关系 ===")
-print(results['age_spending'])
-print("\n=== 不同省份的平均收入 ===")
-print(results['province_income'])
+if __name__ == "__main__":
+    results = analyze_data()
+
+    # 打印统计结果
+    print("=== 性别与消费类别的关联规则 ===")
+    print(results['gender_category_associations'].head())
+    print("\n=== 年龄与消费金额的关系 ===")
+    print(results['age_spending'])
+    print("\n=== 不同省份的平均收入 ===")
+    print(results['province_income'])
@@ -0,0 +1,94 @@
+import io
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+
+# purchase_history 字段的结构，显式给出类型避免逐批推断导致列类型不一致
+PURCHASE_SCHEMA = pa.schema([
+    ('average_price', pa.float64()),
+    ('category', pa.string()),
+    ('items', pa.list_(pa.struct([('id', pa.int64())]))),
+    ('payment_method', pa.string()),
+    ('payment_status', pa.string()),
+    ('purchase_date', pa.string()),
+])
+
+# login_history 字段的结构
+LOGIN_SCHEMA = pa.schema([
+    ('login_count', pa.int64()),
+    ('first_login', pa.string()),
+    ('devices', pa.list_(pa.string())),
+    ('locations', pa.list_(pa.string())),
+])
+
+
+def to_string_array(column):
+    """把 pandas Series / Arrow 数组统一转换为单块的 Arrow 字符串数组"""
+    if isinstance(column, pd.Series):
+        column = pa.array(column, type=pa.large_string(), from_pandas=True)
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    return column.cast(pa.large_string())
+
+
+def to_json_lines(column):
+    """把整列JSON字符串拼接成一个以换行分隔的缓冲区（不逐行生成Python对象）"""
+    array = pc.fill_null(to_string_array(column), '{}')
+    empty, newline = pa.scalar('', pa.large_string()), pa.scalar('\n', pa.large_string())
+    lines = pc.binary_join_element_wise(array, empty, newline)
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int64)
+    start, end = offsets[lines.offset], offsets[lines.offset + len(lines)]
+    return lines.buffers()[2][start:end]
+
+
+def decode_json_column(column, schema, block_size=1 << 24):
+    """使用 pyarrow 的JSON读取器整批解析一列JSON字符串，返回与输入逐行对应的 Arrow 表"""
+    buffer = to_json_lines(column)
+    table = pj.read_json(
+        io.BytesIO(buffer),
+        read_options=pj.ReadOptions(use_threads=True, block_size=block_size),
+        parse_options=pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior='ignore'),
+    )
+    if table.num_rows != len(column):
+        raise ValueError(f"JSON解析行数不一致: 输入 {len(column)} 行, 解析得到 {table.num_rows} 行")
+    return table
+
+
+def decode_purchase_table(column):
+    """批量解析 purchase_history 列，返回 Arrow 表（含 items_count，不含 items）"""
+    table = decode_json_column(column, PURCHASE_SCHEMA)
+    items_count = pc.fill_null(pc.list_value_length(table.column('items')), 0)
+    return table.drop_columns(['items']).append_column('items_count', items_count.cast(pa.int64()))
+
+
+def decode_purchase_history(column):
+    """批量解析 purchase_history 列，返回类型化的 DataFrame（含 items_count，不含 items）"""
+    return decode_purchase_table(column).to_pandas()
+
+
+def distinct_list_lengths(lists):
+    """每行列表中不同取值的个数（等价于逐行 len(set(x))，缺失的列表记为0）"""
+    lists = lists.combine_chunks() if isinstance(lists, pa.ChunkedArray) else lists
+    pairs = pa.table({
+        'row': pc.list_parent_indices(lists),
+        'value': pc.list_flatten(lists),
+    }).group_by(['row', 'value']).aggregate([])
+    return np.bincount(pairs.column('row').to_numpy(), minlength=len(lists)).astype(np.int64)
+
+
+def decode_login_history(column):
+    """一次性批量解析 login_history 列，直接返回 login_count、first_login、device_count、location_count 四列"""
+    table = decode_json_column(column, LOGIN_SCHEMA)
+    first_login = table.column('first_login')
+    try:
+        first_login = first_login.cast(pa.timestamp('us')).to_pandas()
+    except pa.ArrowInvalid:
+        first_login = pd.to_datetime(first_login.to_pandas())
+    return pd.DataFrame({
+        'login_count': pc.fill_null(table.column('login_count'), 0).to_numpy(),
+        'first_login': first_login.to_numpy(),
+        'device_count': distinct_list_lengths(table.column('devices')),
+        'location_count': distinct_list_lengths(table.column('locations')),
+    }, index=column.index if isinstance(column, pd.Series) else None)
@@ -0,0 +1,36 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# 预处理时同时写出的抽样层级（抽样比例），与分析脚本中常用的 frac 对应
+SAMPLE_TIERS = [0.0001, 0.0033, 0.033, 0.1]
+
+# 抽样数据集目录；以下划线开头，pyarrow.dataset 扫描输出目录时会自动忽略
+SAMPLE_DIR = '_samples'
+
+# 用于抽样的稳定行键
+SAMPLE_KEY = 'id'
+
+
+def tier_dir(base_dir, frac):
+    """某个抽样层级的数据目录，如 processed_data/_samples/frac=0.0033"""
+    return os.path.join(base_dir, SAMPLE_DIR, f"frac={frac:g}")
+
+
+def choose_tier(frac, tiers=SAMPLE_TIERS):
+    """不小于 frac 的最小抽样层级，没有时返回 None（需要读取全量数据）"""
+    candidates = [t for t in tiers if t >= frac]
+    return min(candidates) if candidates else None
+
+
+def hash_unit(keys):
+    """把行键稳定地映射到 [0, 1)：同一个键在任何批次、任何进程中结果相同"""
+    values = keys.to_numpy(zero_copy_only=False) if isinstance(keys, (pa.Array, pa.ChunkedArray)) else np.asarray(keys)
+    hashed = pd.util.hash_array(values)
+    return (hashed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def sample_mask(keys, frac):
+    """哈希值小于 frac 的行入选；比例越大的层级包含所有比例更小的层级"""
+    return hash_unit(keys) < frac
@@ -1,6 +1,6 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
+from 全量分析 import load_result
 from matplotlib import font_manager
 
 # 设置字体（适配中文系统可省略）
@@ -10,30 +10,13 @@ plt.rcParams['axes.unicode_minus'] = False  # 防止负号显示为方块
 
 
 def plot_avg_price_by_category(input_folder, output_image_path):
-    category_price_data = []
-
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.parquet'):
-            file_path = os.path.join(input_folder, filename)
-            try:
-                df = pd.read_parquet(file_path, columns=["payment_method", "avg_price"])
-                category_price_data.append(df)
-                print(f"✅ Processed: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to process {filename}: {e}")
-
-    if not category_price_data:
+    # 各支付方式的平均消费金额（全量分析 中的 payment_method_price，经结果缓存，数据未变化时不再扫描；
+    # 原来读取的 avg_price 列在现在的预处理输出中为 average_price）
+    avg_price_by_category = load_result('payment_method_price', input_dir=input_folder).dropna()
+    if avg_price_by_category.empty:
         print("⚠️ No data collected.")
         return
-
-    # 合并所有数据
-    combined_df = pd.concat(category_price_data, ignore_index=True)
-
-    # 删除空值
-    combined_df = combined_df.dropna(subset=["payment_method", "avg_price"])
-
-    # 按类别计算平均价格
-    avg_price_by_category = combined_df.groupby("payment_method")["avg_price"].mean().sort_values(ascending=False)
+    avg_price_by_category = avg_price_by_category.sort_values(ascending=False)
 
     # 绘图
     plt.figure(figsize=(12, 6))
@@ -1,32 +1,18 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
+from 全量分析 import load_result
 
 plt.rcParams['font.family'] = 'Arial'
 plt.rcParams['axes.unicode_minus'] = False
 
 
 def plot_income_by_gender(input_folder, output_image_path):
-    gender_income_data = []
-
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.parquet'):
-            file_path = os.path.join(input_folder, filename)
-            try:
-                df = pd.read_parquet(file_path, columns=["gender", "income"])
-                gender_income_data.append(df)
-                print(f"✅ Processed: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to process {filename}: {e}")
-
-    if not gender_income_data:
+    # 各性别的平均收入（全量分析 中的 gender_income，经结果缓存，数据未变化时不再扫描）
+    avg_income_by_gender = load_result('gender_income', input_dir=input_folder).dropna()
+    if avg_income_by_gender.empty:
         print("⚠️ No data collected.")
         return
-
-    combined_df = pd.concat(gender_income_data, ignore_index=True)
-    combined_df = combined_df.dropna(subset=["gender", "income"])
-
-    avg_income_by_gender = combined_df.groupby("gender")["income"].mean().sort_values(ascending=False)
+    avg_income_by_gender = avg_income_by_gender.sort_values(ascending=False)
 
     # 绘图
     plt.figure(figsize=(8, 6))
@@ -20,8 +20,8 @@ all_parquet_files = [f for f in os.listdir(input_directory) if f.endswith('.parq
 num_samples = min(100, len(all_parquet_files))
 parquet_files = random.sample(all_parquet_files, num_samples)
 
-# 初始化一个空的DataFrame，准备存储数据
-combined_data = pd.DataFrame()
+# 散点图需要逐行数据：每个文件的数据先放入列表，最后只拼接一次（避免循环内反复拷贝）
+frames = []
 
 # 加载数据，逐个文件处理，减少内存压力
 for file in tqdm(parquet_files, desc="加载文件", ncols=100):
@@ -30,10 +30,11 @@ for file in tqdm(parquet_files, desc="加载文件", ncols=100):
     # 加载数据时只选择 'income', 'age', 'category' 三列
     try:
         df = pd.read_parquet(file_path, columns=['income', 'age', 'category'])
-        combined_data = pd.concat([combined_data, df], ignore_index=True)
+        frames.append(df)
     except Exception as e:
         print(f"跳过文件 {file}，错误：{e}")
         continue
+combined_data = pd.concat(frames, ignore_index=True)
 
 # 去除空值
 combined_data = combined_data.dropna(subset=['income', 'age', 'category'])
@@ -27,14 +27,12 @@ all_parquet_files = [f for f in os.listdir(input_directory) if f.endswith('.parq
 num_samples = min(100, len(all_parquet_files))
 parquet_files = random.sample(all_parquet_files, num_samples)
 
-# 初始化总数据
-all_data = pd.DataFrame()
-
-# 加载数据
+# 加载数据：聚类需要逐行数据，只读取用到的两列，最后只拼接一次（避免循环内反复拷贝）
+frames = []
 for file in tqdm(parquet_files, desc="加载文件", ncols=100):
     file_path = os.path.join(input_directory, file)
-    df = pd.read_parquet(file_path)
-    all_data = pd.concat([all_data, df], ignore_index=True)
+    frames.append(pd.read_parquet(file_path, columns=['income', 'average_price']))
+all_data = pd.concat(frames, ignore_index=True)
 
 # 抽样数据
 sampled_df = all_data.sample(frac=1, random_state=42)
@@ -0,0 +1,216 @@
+import os
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from 输出模式 import OUTPUT_SCHEMA, enforce_schema, measure_saving
+from 抽样层级 import SAMPLE_KEY, tier_dir, hash_unit
+
+# 每个输出文件大约包含的输入批次数（50000行/批 × 40 = 200万行/文件），按 row group 边界划分
+BATCHES_PER_FILE = 40
+
+# ParquetWriter 默认参数，可在调用时逐项覆盖
+DEFAULT_WRITER_OPTIONS = {
+    'row_group_size': 250000,      # 每个 row group 的行数
+    'compression': 'zstd',         # 压缩算法: zstd / snappy / gzip / none
+    'compression_level': None,     # 压缩级别（None 为默认级别）
+    'use_dictionary': True,        # 是否对字符串列使用字典编码，也可以传列名列表
+    'write_statistics': True,      # 是否写出列统计信息(min/max/null_count)，也可以传列名列表
+}
+
+# 可以作为分区键的派生列
+DERIVED_PARTITION_COLUMNS = {
+    'purchase_month': lambda df: df['purchase_date'].str.slice(0, 7),
+}
+
+# Hive 分区中缺失值使用的目录名（与 pyarrow 的默认值一致）
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+class BatchFileWriter:
+    """把连续批次的处理结果流式写入少量大文件 {base_name}_part{file_index}.parquet，切换 file_index 时滚动到新文件"""
+
+    def __init__(self, output_dir, base_name, writer_options=None, schema_spec=OUTPUT_SCHEMA):
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.options = {**DEFAULT_WRITER_OPTIONS, **(writer_options or {})}
+        self.schema_spec = schema_spec
+        self.writer = None
+        self.schema = None
+        self.file_index = None
+        self.path = None
+        self.rows = 0
+        self.pending = []
+        self.pending_rows = 0
+        self.summary = []
+
+    def _open(self, file_index, schema):
+        self.close_current()
+        self.file_index = file_index
+        self.path = os.path.join(self.output_dir, f"{self.base_name}_part{file_index}.parquet")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.schema = schema
+        self.rows = 0
+        self.memory_saved = 0
+        self.disk_saved_per_row = None
+        self.writer = pq.ParquetWriter(
+            self.path, schema,
+            compression=self.options['compression'],
+            compression_level=self.options['compression_level'],
+            use_dictionary=self.options['use_dictionary'],
+            write_statistics=self.options['write_statistics'],
+        )
+
+    def write(self, file_index, df):
+        """把一个批次的处理结果追加写入第 file_index 个输出文件"""
+        table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+        original = table
+        if self.schema_spec:
+            table = enforce_schema(table, self.schema_spec)
+        if self.writer is None or file_index != self.file_index:
+            self._open(file_index, table.schema)
+        elif not table.schema.equals(self.schema):
+            table = table.select(self.schema.names).cast(self.schema)
+        if self.schema_spec and table.num_rows:
+            # 磁盘节省只在每个文件的第一个非空批次上实测，再按行数折算
+            measure_disk = self.disk_saved_per_row is None
+            memory, disk = measure_saving(original, table, self.options['compression'] or 'none', measure_disk)
+            self.memory_saved += memory
+            if measure_disk:
+                self.disk_saved_per_row = disk / table.num_rows
+        self.pending.append(table)
+        self.pending_rows += table.num_rows
+        self.rows += table.num_rows
+        if self.pending_rows >= self.options['row_group_size']:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        """攒够 row_group_size 行再写出，避免每个小批次各自形成一个很小的 row group"""
+        if not self.pending:
+            return
+        table = pa.concat_tables(self.pending)
+        size = self.options['row_group_size']
+        full = table.num_rows if final else table.num_rows - table.num_rows % size
+        if full > 0:
+            self.writer.write_table(table.slice(0, full), row_group_size=size)
+        rest = table.slice(full)
+        self.pending = [rest] if rest.num_rows else []
+        self.pending_rows = rest.num_rows
+
+    def close_current(self):
+        if self.writer is not None:
+            self._flush(final=True)
+            self.writer.close()
+            self.summary.append({'file': self.path, 'rows': self.rows, 'bytes': os.path.getsize(self.path),
+                                 'memory_saved': self.memory_saved,
+                                 'disk_saved': (self.disk_saved_per_row or 0) * self.rows})
+            self.writer = None
+
+    def close(self):
+        """关闭当前文件，返回本写出器产生的所有文件的行数和大小"""
+        self.close_current()
+        return self.summary
+
+
+class PartitionedFileWriter:
+    """按分区键写出 Hive 风格的分区数据集，如 country=中国/purchase_month=2024-03/{base_name}_part{i}.parquet"""
+
+    def __init__(self, output_dir, base_name, partition_keys, writer_options=None, schema_spec=OUTPUT_SCHEMA):
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.partition_keys = list(partition_keys)
+        self.writer_options = writer_options
+        self.schema_spec = schema_spec
+        self.writers = {}
+        # 所有分区累计等待写出的行数上限，超过后把最大的分区先写出，控制内存
+        self.max_pending_rows = {**DEFAULT_WRITER_OPTIONS, **(writer_options or {})}['row_group_size']
+
+    def _partition_dir(self, values):
+        parts = [f"{k}={NULL_PARTITION if pd.isna(v) else quote(str(v), safe='')}"
+                 for k, v in zip(self.partition_keys, values)]
+        return os.path.join(self.output_dir, *parts)
+
+    def write(self, file_index, df):
+        """把一个批次按分区键拆分后分别追加写入对应分区的第 file_index 个文件"""
+        df = df.to_pandas() if isinstance(df, pa.Table) else df.copy(deep=False)
+        for k in self.partition_keys:
+            if k not in df.columns and k in DERIVED_PARTITION_COLUMNS:
+                df[k] = DERIVED_PARTITION_COLUMNS[k](df)
+        for values, part in df.groupby(self.partition_keys, observed=True, dropna=False, sort=False):
+            values = values if isinstance(values, tuple) else (values,)
+            path = self._partition_dir(values)
+            if path not in self.writers:
+                self.writers[path] = BatchFileWriter(path, self.base_name, self.writer_options, self.schema_spec)
+            self.writers[path].write(file_index, part.drop(columns=self.partition_keys))
+
+        pending = sum(w.pending_rows for w in self.writers.values())
+        while pending > self.max_pending_rows:
+            largest = max(self.writers.values(), key=lambda w: w.pending_rows)
+            pending -= largest.pending_rows
+            largest._flush(final=True)
+
+    def close(self):
+        summary = []
+        for writer in self.writers.values():
+            summary.extend(writer.close())
+        return summary
+
+
+class SampleTierWriter:
+    """写出完整结果的同时，按行键哈希把各抽样层级写到 {output_dir}/_samples/frac={比例}/ 下，
+    各层级相互嵌套（比例小的层级是比例大的层级的子集），重跑结果完全相同"""
+
+    def __init__(self, writer, output_dir, base_name, sample_tiers, writer_options=None, partition_keys=None):
+        self.writer = writer
+        self.tier_writers = {t: make_writer(tier_dir(output_dir, t), base_name, writer_options, partition_keys)
+                             for t in sample_tiers}
+
+    def write(self, file_index, df):
+        self.writer.write(file_index, df)
+        keys = df.column(SAMPLE_KEY) if isinstance(df, pa.Table) else df[SAMPLE_KEY]
+        unit = hash_unit(keys)
+        for t, writer in self.tier_writers.items():
+            mask = unit < t
+            writer.write(file_index, df.filter(pa.array(mask)) if isinstance(df, pa.Table) else df[mask])
+
+    def close(self):
+        summary = self.writer.close()
+        for t, writer in self.tier_writers.items():
+            summary.extend({**entry, 'sample_tier': t} for entry in writer.close())
+        return summary
+
+
+def make_writer(output_dir, base_name, writer_options=None, partition_keys=None, sample_tiers=None):
+    """根据是否指定分区键创建普通写出器或分区写出器，指定 sample_tiers 时同时写出抽样层级"""
+    if partition_keys:
+        writer = PartitionedFileWriter(output_dir, base_name, partition_keys, writer_options)
+    else:
+        writer = BatchFileWriter(output_dir, base_name, writer_options)
+    if sample_tiers:
+        writer = SampleTierWriter(writer, output_dir, base_name, sample_tiers, writer_options, partition_keys)
+    return writer
+
+
+def print_file_summary(summary):
+    """打印每个输出文件的大小和行数"""
+    print("输出文件汇总:")
+    root = os.path.commonpath([os.path.dirname(s['file']) for s in summary]) if summary else ''
+    for s in sorted(summary, key=lambda x: x['file']):
+        line = f"  {os.path.relpath(s['file'], root)}: {s['rows']} 行, {s['bytes'] / (1024 ** 2):.2f} MB"
+        if 'memory_saved' in s:
+            line += (f", 类型压缩节省内存 {s['memory_saved'] / (1024 ** 2):.2f} MB"
+                     f", 节省磁盘约 {s['disk_saved'] / (1024 ** 2):.2f} MB")
+        print(line)
+    # 抽样层级的文件单独汇总，不计入总行数
+    tiers = sorted({s['sample_tier'] for s in summary if 'sample_tier' in s})
+    for t in tiers:
+        entries = [s for s in summary if s.get('sample_tier') == t]
+        print(f"抽样层级 {t:g}: {len(entries)} 个文件, {sum(s['rows'] for s in entries)} 行, "
+              f"{sum(s['bytes'] for s in entries) / (1024 ** 2):.2f} MB")
+    summary = [s for s in summary if 'sample_tier' not in s]
+    total_rows = sum(s['rows'] for s in summary)
+    total_mb = sum(s['bytes'] for s in summary) / (1024 ** 2)
+    print(f"共 {len(summary)} 个文件, {total_rows} 行, {total_mb:.2f} MB")
+    if summary and 'memory_saved' in summary[0]:
+        print(f"类型压缩共节省内存 {sum(s['memory_saved'] for s in summary) / (1024 ** 2):.2f} MB, "
+              f"磁盘约 {sum(s['disk_saved'] for s in summary) / (1024 ** 2):.2f} MB")
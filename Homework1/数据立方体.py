@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+from itertools import combinations
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from 全局统计 import file_key
+from 数据读取 import list_parquet_files
+from 直方图 import bin_codes
+
+# 立方体目录，放在数据目录下（以下划线开头，不会被当作数据文件读取）
+CUBE_DIR = '_cube'
+CUBE_FILE = 'cube.parquet'
+MANIFEST_FILE = 'manifest.json'
+PARTS_DIR = 'parts'
+
+AGE_BINS = [0, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+AGE_LABELS = ['0-20', '21-30', '31-40', '41-50', '51-60', '61-70', '71-80', '81-90', '91+']
+INCOME_BINS = [0, 100000, 200000, 300000, 400000, 500000, 600000,
+               700000, 800000, 900000, 1000000, float('inf')]
+INCOME_LABELS = ['<10万', '10-20万', '20-30万', '30-40万', '40-50万',
+                 '50-60万', '60-70万', '70-80万', '80-90万', '90-100万', '>100万']
+
+# 维度：原始列直接使用，年龄段和收入段由数值列分箱得到
+DIMENSIONS = ['country', 'gender', 'province', 'age_range', 'income_range',
+              'category', 'payment_method', 'payment_status']
+BUCKETS = {
+    'age_range': ('age', AGE_BINS, AGE_LABELS),
+    'income_range': ('income', INCOME_BINS, INCOME_LABELS),
+}
+
+# 度量：每个单元格保存 非空计数、和、平方和（可相加，因此可以上卷和增量合并）
+MEASURES = ['income', 'average_price']
+
+# 物化的维度组合：全部单维、两两组合，以及常用的三维组合
+CUBOIDS = ([(d,) for d in DIMENSIONS] + list(combinations(DIMENSIONS, 2)) + [
+    ('country', 'gender', 'income_range'),
+    ('country', 'gender', 'age_range'),
+    ('province', 'gender', 'category'),
+    ('age_range', 'income_range', 'gender'),
+    ('category', 'payment_method', 'payment_status'),
+])
+
+
+def cuboid_name(dims):
+    return '|'.join(dims)
+
+
+def source_columns(dims):
+    """计算这些维度需要读取的原始列"""
+    return list(dict.fromkeys(BUCKETS[d][0] if d in BUCKETS else d for d in dims))
+
+
+def dimension_values(df, dim):
+    """维度取值（object 数组，缺失值为 None）；分箱维度按分箱边界转换为区间标签"""
+    if dim in BUCKETS:
+        column, bins, labels = BUCKETS[dim]
+        return np.array(list(labels) + [None], dtype=object)[bin_codes(df[column], bins)]
+    return df[dim].astype(object).where(df[dim].notna(), None).to_numpy()
+
+
+def reduce_cuboid(codes, uniques, dims, measures):
+    """把各维度的整数编码合并为一个键，用 np.unique + np.bincount 计算每个单元格的计数、和与平方和"""
+    key = np.zeros(len(next(iter(codes.values()))), dtype=np.int64)
+    for d in dims:
+        key = key * len(uniques[d]) + codes[d]
+    cells, inverse = np.unique(key, return_inverse=True)
+
+    frame = {'cuboid': cuboid_name(dims)}
+    rest = cells
+    for d in reversed(dims):
+        frame[d] = uniques[d][rest % len(uniques[d])]
+        rest = rest // len(uniques[d])
+    frame['count'] = np.bincount(inverse, minlength=len(cells))
+    for m, values in measures.items():
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        frame[f'{m}_count'] = np.bincount(inverse, weights=valid, minlength=len(cells)).astype(np.int64)
+        frame[f'{m}_sum'] = np.bincount(inverse, weights=filled, minlength=len(cells))
+        frame[f'{m}_sumsq'] = np.bincount(inverse, weights=filled ** 2, minlength=len(cells))
+    return pd.DataFrame(frame)
+
+
+def combine_cells(frame):
+    """相同组合、相同维度取值的单元格相加"""
+    keys = ['cuboid'] + [d for d in DIMENSIONS if d in frame.columns]
+    return frame.groupby(keys, dropna=False, sort=False).sum().reset_index()
+
+
+def cube_file(path, cuboids, batch_size=500000):
+    """逐批读取一个文件，计算所有维度组合的单元格（结果很小，与文件行数无关）"""
+    dims = list(dict.fromkeys(d for c in cuboids for d in c))
+    parquet_file = pq.ParquetFile(path)
+    columns = source_columns(dims) + [m for m in MEASURES if m not in source_columns(dims)]
+    parts = []
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        df = batch.to_pandas()
+        codes, uniques = {}, {}
+        for d in dims:
+            codes[d], uniques[d] = pd.factorize(dimension_values(df, d), use_na_sentinel=False)
+            uniques[d] = np.asarray(uniques[d], dtype=object)
+        measures = {m: df[m].to_numpy('float64', na_value=np.nan) for m in MEASURES}
+        parts.extend(reduce_cuboid(codes, uniques, c, measures) for c in cuboids)
+    return combine_cells(pd.concat(parts, ignore_index=True)) if parts else None
+
+
+def build_cube(input_dir, cuboids=None, batch_size=500000):
+    """建立或增量更新数据立方体：每个输入文件的单元格单独保存，只为新增或修改过的文件重新计算；
+    只有新增文件时把新单元格加到已有立方体上，有文件被修改或删除时由各文件的单元格重新合并
+    """
+    files = list_parquet_files(input_dir)
+    schema_names = set(pq.read_schema(files[0]).names) if files else set()
+    cuboids = [tuple(c) for c in (cuboids or CUBOIDS)
+               if all(col in schema_names for col in source_columns(c))]
+    cube_dir = os.path.join(input_dir, CUBE_DIR)
+    os.makedirs(os.path.join(cube_dir, PARTS_DIR), exist_ok=True)
+    manifest_path = os.path.join(cube_dir, MANIFEST_FILE)
+    manifest = {'cuboids': [], 'files': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    rebuild = False
+    if [list(c) for c in cuboids] != manifest['cuboids']:
+        # 维度组合变化时全部重算：旧的单元格（包括已去掉的组合）不能再与新计算的单元格相加
+        manifest = {'cuboids': [list(c) for c in cuboids], 'files': {}}
+        shutil.rmtree(os.path.join(cube_dir, PARTS_DIR))
+        os.makedirs(os.path.join(cube_dir, PARTS_DIR))
+        rebuild = True
+
+    entries, added = {}, []
+    for path in files:
+        name = os.path.relpath(path, input_dir)
+        entry = manifest['files'].get(name)
+        key = file_key(path)
+        if entry is not None and entry['key'] == key:
+            entries[name] = entry
+            continue
+        print(f"正在计算立方体单元格: {name}")
+        part = cube_file(path, cuboids, batch_size)
+        part_name = hashlib.sha1(name.encode('utf-8')).hexdigest()[:16] + '.parquet'
+        if part is not None:
+            part.to_parquet(os.path.join(cube_dir, PARTS_DIR, part_name))
+            added.append(part)
+        entries[name] = {'key': key, 'part': part_name if part is not None else None}
+        rebuild = rebuild or entry is not None
+    removed = set(manifest['files']) - set(entries)
+    for name in removed:
+        part_name = manifest['files'][name]['part']
+        if part_name and os.path.exists(os.path.join(cube_dir, PARTS_DIR, part_name)):
+            os.remove(os.path.join(cube_dir, PARTS_DIR, part_name))
+
+    cube_path = os.path.join(cube_dir, CUBE_FILE)
+    if rebuild or removed or not os.path.exists(cube_path):
+        parts = [pd.read_parquet(os.path.join(cube_dir, PARTS_DIR, e['part'])) for e in entries.values() if e['part']]
+    elif added:
+        parts = [pd.read_parquet(cube_path)] + added
+    else:
+        parts = None
+    if parts is not None:
+        cube = combine_cells(pd.concat(parts, ignore_index=True)) if parts else pd.DataFrame()
+        cube.to_parquet(cube_path)
+        print(f"立方体已更新: {len(cuboids)} 个维度组合, {len(cube)} 个单元格, 新增/修改 {len(added)} 个文件")
+
+    manifest['files'] = entries
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return cube_path
+
+
+class Cube:
+    """物化的数据立方体：按维度上卷、切片，直接由预计算的单元格得到计数、均值和标准差，不读取原始数据"""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.cuboids = {name: tuple(name.split('|')) for name in cells['cuboid'].unique()} if len(cells) else {}
+
+    @classmethod
+    def load(cls, input_dir, refresh=True):
+        """读取数据目录的立方体；refresh 为 True 时先增量更新"""
+        if refresh:
+            build_cube(input_dir)
+        return cls(pd.read_parquet(os.path.join(input_dir, CUBE_DIR, CUBE_FILE)))
+
+    def _cuboid_for(self, dims):
+        """包含所有所需维度、且维度最少的物化组合"""
+        candidates = [(len(c), name) for name, c in self.cuboids.items() if set(dims) <= set(c)]
+        if not candidates:
+            raise ValueError(f"没有包含维度 {sorted(dims)} 的物化组合，请在 CUBOIDS 中添加后重建立方体")
+        return min(candidates)[1]
+
+    def query(self, by, where=None, dropna=True):
+        """按 by 中的维度分组（上卷掉其余维度），where 为 {维度: 取值或取值列表} 的切片条件；
+        返回每组的 count 以及各度量的 mean、std（样本标准差）和 sum
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        where = where or {}
+        name = self._cuboid_for(set(by) | set(where))
+        cells = self.cells[self.cells['cuboid'] == name]
+        for d, value in where.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            cells = cells[cells[d].isin(values)]
+        if dropna:
+            cells = cells.dropna(subset=by)
+
+        columns = ['count'] + [f'{m}_{s}' for m in MEASURES for s in ('count', 'sum', 'sumsq')]
+        if by:
+            grouped = cells.groupby(by, dropna=False)[columns].sum()
+        else:
+            grouped = cells[columns].sum().to_frame().T.astype(cells[columns].dtypes)
+        result = grouped[['count']].copy()
+        for m in MEASURES:
+            n, total, squares = grouped[f'{m}_count'], grouped[f'{m}_sum'], grouped[f'{m}_sumsq']
+            result[f'{m}_sum'] = total
+            result[f'{m}_mean'] = total / n.replace(0, np.nan)
+            variance = (squares - total ** 2 / n.replace(0, np.nan)) / (n - 1).where(n > 1)
+            result[f'{m}_std'] = np.sqrt(variance.clip(lower=0))
+        return result
+
+    def crosstab(self, row, column, where=None, value='count', top=None):
+        """两个维度的交叉表（value 为 query 结果中的列），top 不为空时只保留 count 最多的前 top 行"""
+        table = self.query([row, column], where)[value].unstack(fill_value=0 if value == 'count' else np.nan)
+        # 分箱维度按区间顺序排列，而不是按标签的字典序
+        if row in BUCKETS:
+            table = table.reindex([l for l in BUCKETS[row][2] if l in table.index])
+        if column in BUCKETS:
+            table = table[[l for l in BUCKETS[column][2] if l in table.columns]]
+        if top is not None:
+            totals = self.query(row, where)['count']
+            table = table.loc[totals.sort_values(ascending=False).index[:top].intersection(table.index, sort=False)]
+        return table
+
+
+if __name__ == "__main__":
+    build_cube(*sys.argv[1:2])
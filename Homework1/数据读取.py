@@ -0,0 +1,124 @@
+import os
+from fnmatch import fnmatch
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from 区域索引 import candidate_row_groups, update_zone_index
+from 抽样层级 import SAMPLE_KEY, choose_tier, sample_mask, tier_dir
+
+
+def list_parquet_files(base_dir, patterns=None):
+    """递归列出目录下的 Parquet 文件（跳过 _samples 等以下划线或点开头的目录，以及 categories.json 等非数据文件）
+    patterns 为文件名通配符（字符串或列表，如 '*4.parquet'），不为空时只保留文件名匹配其中之一的文件
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    files = []
+    for root, dirs, names in os.walk(base_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(('_', '.')))
+        files.extend(os.path.join(root, n) for n in sorted(names) if n.endswith('.parquet')
+                     and (not patterns or any(fnmatch(n, p) for p in patterns)))
+    return files
+
+
+def open_partitioned(base_dir, patterns=None):
+    """打开 Hive 风格分区的预处理结果（分区键从目录名中解析），patterns 见 list_parquet_files"""
+    return ds.dataset(list_parquet_files(base_dir, patterns), format='parquet', partitioning='hive',
+                      partition_base_dir=base_dir)
+
+
+def read_partitioned(base_dir, filter=None, columns=None):
+    """按过滤表达式读取分区数据集：只打开满足分区条件的文件，返回 DataFrame
+
+    示例: read_partitioned('processed_data', ds.field('country') == '中国', ['income', 'gender'])
+    """
+    dataset = open_partitioned(base_dir)
+    total = len(dataset.files)
+    selected = len(list(dataset.get_fragments(filter=filter))) if filter is not None else total
+    print(f"分区裁剪: 读取 {selected}/{total} 个文件")
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+def build_zone_index(base_dir):
+    """建立或增量更新数据目录的区域索引（每个文件、每个 row group 的 min/max 与取值集合）"""
+    return update_zone_index(base_dir, list_parquet_files(base_dir))
+
+
+def column_range(base_dir, column):
+    """由区域索引（各 row group 的统计信息）得到数值列在整个目录中的最小值和最大值，不读取数据"""
+    index = build_zone_index(base_dir)
+    groups = [g for entry in index['files'].values() for g in entry['row_groups'] if g['min'].get(column) is not None]
+    if not groups:
+        return None, None
+    return min(g['min'][column] for g in groups), max(g['max'][column] for g in groups)
+
+
+def iter_indexed(base_dir, filters, columns=None, files=None):
+    """按区域索引跳过不可能满足条件的文件和 row group，逐个文件扫描其余部分并精确过滤，依次返回 Arrow 表
+    filters 为 [(列, 运算符, 值), ...]，条件之间为"且"，运算符支持 ==、!=、<、<=、>、>=、in、not in；
+    files 为文件名通配符，不为空时只读取匹配的文件（见 list_parquet_files）
+    """
+    index = build_zone_index(base_dir)
+    dataset = open_partitioned(base_dir, files)
+    expression = pq.filters_to_expression(filters) if filters else None
+    groups, opened = 0, 0
+    selected = {os.path.relpath(path, base_dir) for path in dataset.files}
+    total_groups = sum(len(entry['row_groups']) for name, entry in index['files'].items() if name in selected)
+    # 分区键条件先按目录裁剪文件，其余条件再按区域索引跳过 row group
+    for fragment in dataset.get_fragments(filter=expression):
+        entry = index['files'].get(os.path.relpath(fragment.path, base_dir))
+        if entry is None:
+            row_groups = list(range(fragment.num_row_groups))
+        else:
+            row_groups = candidate_row_groups(entry, filters or [])
+        if not row_groups:
+            continue
+        opened += 1
+        groups += len(row_groups)
+        scanner = ds.Scanner.from_fragment(fragment.subset(row_group_ids=row_groups), schema=dataset.schema,
+                                           columns=columns, filter=expression)
+        yield scanner.to_table()
+    print(f"区域索引: 读取 {opened}/{len(dataset.files)} 个文件, {groups}/{total_groups} 个 row group")
+
+
+def scan_indexed(base_dir, filters, columns=None, files=None):
+    """按区域索引读取满足条件的数据，返回合并后的 Arrow 表"""
+    tables = list(iter_indexed(base_dir, filters, columns, files))
+    if not tables:
+        dataset = open_partitioned(base_dir, files)
+        return ds.Scanner.from_dataset(dataset, columns=columns).projected_schema.empty_table()
+    return pa.concat_tables(tables)
+
+
+def read_indexed(base_dir, filters, columns=None):
+    """按区域索引读取满足条件的数据，返回 DataFrame
+
+    示例: read_indexed('10G_data', [('income', '>', 0), ('income', '<=', 1000000)], ['country', 'income'])
+    """
+    return scan_indexed(base_dir, filters, columns).to_pandas()
+
+
+def read_sample(base_dir, frac, columns=None, filters=None, files=None):
+    """读取预处理时写出的抽样层级：只读取不小于 frac 的最小层级，必要时再按同一哈希细分到 frac，返回 DataFrame
+    没有合适的层级（或层级未写出）时读取全量数据再按哈希抽样
+
+    filters 与 read_indexed 相同，按抽样层级的区域索引跳过不满足条件的文件和 row group；
+    files 为文件名通配符（抽样层级中的文件与全量数据同名），用于只分析部分输出文件，没有匹配的文件时读取全部文件
+
+    示例: read_sample('processed_data', 0.0033, ['age', 'average_price'])
+    """
+    tier = choose_tier(frac)
+    source = tier_dir(base_dir, tier) if tier is not None else base_dir
+    if not os.path.isdir(source):
+        print(f"警告: 抽样层级 {source} 不存在，读取全量数据后抽样")
+        source, tier = base_dir, None
+    if files is not None and not list_parquet_files(source, files):
+        print(f"警告: {source} 中没有文件名匹配 {files} 的文件，读取全部文件")
+        files = None
+    read_columns = columns if columns is None or SAMPLE_KEY in columns else list(columns) + [SAMPLE_KEY]
+    table = scan_indexed(source, filters, read_columns, files)
+    if tier != frac:
+        table = table.filter(pa.array(sample_mask(table.column(SAMPLE_KEY), frac)))
+    print(f"抽样读取: {source}, 比例 {frac:g}, {table.num_rows} 行")
+    df = table.to_pandas()
+    return df if read_columns is columns else df.drop(columns=[SAMPLE_KEY])
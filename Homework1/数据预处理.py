@@ -1,51 +1,56 @@
 import os
 import pandas as pd
-import json
-import re
 import gc
 from datetime import datetime
-from pandas import json_normalize
+import pyarrow as pa
 import pyarrow.parquet as pq
+from 批量解析 import decode_purchase_history, decode_login_history
+from 时间解析 import TimestampParser
+from 全局统计 import load_or_compute_global_stats
+from 省份解析 import resolve_provinces
+from 输出模式 import CLEAN_OUTPUT_SCHEMA, SchemaViolation, enforce_schema, measure_saving
+from 预处理流水线 import CLEAN_PIPELINE_SPEC, scan_row_groups
 
 
-def clean_and_process(df):
-    df['last_login'] = pd.to_datetime(df['last_login'], errors='coerce').dt.tz_localize(None)
-    df['registration_date'] = pd.to_datetime(df['registration_date'], errors='coerce')
+def clean_and_process(df, global_stats=None, time_parser=None):
+    time_parser = time_parser or TimestampParser()
+    df['last_login'] = time_parser.parse_series('last_login', df['last_login'])
+    df['registration_date'] = time_parser.parse_series('registration_date', df['registration_date'])
 
     try:
-        df['purchase_history'] = df['purchase_history'].apply(json.loads)
-        purchase_df = json_normalize(df['purchase_history'])
+        purchase_df = decode_purchase_history(df['purchase_history'])
         df = pd.concat([df.drop('purchase_history', axis=1), purchase_df], axis=1)
-        df['items_count'] = df['items'].apply(lambda x: len(x) if isinstance(x, list) else 0)
-        df.drop(columns=['items'], inplace=True)
     except Exception as e:
         print(f"购买历史字段处理失败: {e}")
         df['items_count'] = 0
 
     try:
-        df['login_history'] = df['login_history'].apply(json.loads)
-        df['login_count'] = df['login_history'].apply(lambda x: x.get('login_count', 0))
-        df['first_login'] = pd.to_datetime(df['login_history'].apply(lambda x: x.get('first_login')))
-        df['device_count'] = df['login_history'].apply(lambda x: len(set(x.get('devices', []))))
-        df['location_count'] = df['login_history'].apply(lambda x: len(set(x.get('locations', []))))
-        df.drop(columns=['login_history'], inplace=True)
+        # 整列只解析一次，四个登录特征直接以类型化的列返回
+        login_df = decode_login_history(df['login_history'])
+        df = pd.concat([df.drop('login_history', axis=1), login_df], axis=1)
     except Exception as e:
         print(f"登录历史字段处理失败: {e}")
         df['login_count'] = 0
         df['device_count'] = 0
         df['location_count'] = 0
 
-    df['province'] = df['address'].apply(
-        lambda x: re.search(r'(.*?省)', x).group(1) if isinstance(x, str) and '省' in x else '其他'
-    )
+    df['province'] = resolve_provinces(df['address'], default='其他')
 
     df['gender'] = df['gender'].fillna('未知')
-    df['age'] = df['age'].fillna(df['age'].median())
-    df['income'] = df['income'].fillna(df['income'].median())
+    if global_stats is not None:
+        df['age'] = df['age'].fillna(global_stats['age']['median'])
+        df['income'] = df['income'].fillna(global_stats['income']['median'])
+    else:
+        df['age'] = df['age'].fillna(df['age'].median())
+        df['income'] = df['income'].fillna(df['income'].median())
 
     df = df[(df['age'] > 0) & (df['age'] < 120)]
-    Q1 = df['income'].quantile(0.25)
-    Q3 = df['income'].quantile(0.75)
+    if global_stats is not None:
+        Q1 = global_stats['income']['q1']
+        Q3 = global_stats['income']['q3']
+    else:
+        Q1 = df['income'].quantile(0.25)
+        Q3 = df['income'].quantile(0.75)
     IQR = Q3 - Q1
     df = df[(df['income'] >= (Q1 - 1.5 * IQR)) & (df['income'] <= (Q3 + 1.5 * IQR))]
 
@@ -57,39 +62,61 @@ def clean_and_process(df):
     return df
 
 
-def process_large_parquet_file(input_file, output_folder):
+def process_large_parquet_file(input_file, output_folder, global_stats=None):
     pf = pq.ParquetFile(input_file)
     total_row_groups = pf.num_row_groups
     base_filename = os.path.splitext(os.path.basename(input_file))[0]
+    time_parser = TimestampParser()
 
     for i in range(total_row_groups):
         try:
-            batch_table = pf.read_row_group(i).to_pandas()
-            cleaned_batch = clean_and_process(batch_table)
-
+            # 年龄和收入的过滤条件在读取时下推，不满足条件的行不会进入JSON解析
+            batches = list(scan_row_groups(input_file, [i], CLEAN_PIPELINE_SPEC, global_stats,
+                                           batch_size=pf.metadata.row_group(i).num_rows))
+            if not batches:
+                print(f"row_group {i} 过滤后没有数据，跳过")
+                continue
+            batch_table = pa.Table.from_batches(batches).to_pandas()
+            cleaned_batch = clean_and_process(batch_table, global_stats, time_parser)
+
+            # 按输出模式把数值列转换为最小的安全类型后写出
             output_file = os.path.join(output_folder, f"{base_filename}_part{i}.parquet")
-            cleaned_batch.to_parquet(output_file, index=False)
-            print(f"✅ 成功处理 row_group {i}，保存为：{output_file}")
+            original = pa.Table.from_pandas(cleaned_batch, preserve_index=False)
+            table = enforce_schema(original, CLEAN_OUTPUT_SCHEMA)
+            pq.write_table(table, output_file)
+            memory_saved, disk_saved = measure_saving(original, table, 'snappy', measure_disk=True)
+            print(f"✅ 成功处理 row_group {i}，保存为：{output_file}，"
+                  f"节省内存 {memory_saved / 1024:.1f} KB，节省磁盘 {disk_saved / 1024:.1f} KB")
 
             del batch_table, cleaned_batch
             gc.collect()
+        except SchemaViolation:
+            # 输出列超出允许范围说明清洗逻辑有误，直接中止，不按普通错误跳过
+            raise
         except Exception as e:
             print(f"❌ 处理 row_group {i} 失败：{e}")
 
+    time_parser.report()
+
 
 def main():
     input_dir = '10G_data_new'
     output_dir = '10processed_data'
     os.makedirs(output_dir, exist_ok=True)
 
-    for file in os.listdir(input_dir):
-        if file.endswith('.parquet'):
-            input_file_path = os.path.join(input_dir, file)
-            print(f"正在处理文件：{input_file_path}")
-            try:
-                process_large_parquet_file(input_file_path, output_dir)
-            except Exception as e:
-                print(f"  !!! 文件处理失败：{input_file_path}，错误：{e}")
+    # 第一遍只读统计列，得到全局中位数和IQR边界（草图缓存在输出目录，重跑时跳过）
+    files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.parquet')]
+    global_stats = load_or_compute_global_stats(files, os.path.join(output_dir, 'global_stats.json'))
+
+    for input_file_path in files:
+        print(f"正在处理文件：{input_file_path}")
+        try:
+            process_large_parquet_file(input_file_path, output_dir, global_stats)
+        except SchemaViolation:
+            # 清洗逻辑有误，继续处理其他文件也会得到同样的错误，直接中止
+            raise
+        except Exception as e:
+            print(f"  !!! 文件处理失败：{input_file_path}，错误：{e}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from 批量解析 import to_string_array
+
+# 统一的时间类型：不带时区，int64 微秒
+TIMESTAMP_TYPE = pa.timestamp('us')
+
+# 时区后缀；去掉后按字面时间解析，等价于原来的 tz_localize(None)
+TZ_SUFFIX = r'(Z|[+-]\d{2}:?\d{2})$'
+
+# 按顺序尝试的固定格式（去掉时区后缀之后）
+CANDIDATE_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+]
+
+# 检测格式时使用的样本数
+SAMPLE_SIZE = 100
+
+
+def detect_format(values):
+    """根据样本确定时间列的格式，返回 (strptime 格式, 是否带时区后缀)；没有匹配的固定格式时格式为 None"""
+    sample = values.drop_null().slice(0, SAMPLE_SIZE)
+    if len(sample) == 0:
+        return None, False
+    has_tz = pc.all(pc.match_substring_regex(sample, TZ_SUFFIX)).as_py()
+    if has_tz:
+        sample = pc.replace_substring_regex(sample, TZ_SUFFIX, '')
+    for fmt in CANDIDATE_FORMATS:
+        try:
+            pc.strptime(sample, format=fmt, unit='us')
+            return fmt, has_tz
+        except pa.ArrowInvalid:
+            continue
+    return None, has_tz
+
+
+def parse_with_pandas(values):
+    """固定格式解析失败的取值交给 pandas 推断（去掉时区后缀，无法解析的置为缺失值）"""
+    values = pc.replace_substring_regex(values, TZ_SUFFIX, '').to_pandas()
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    return pa.array(parsed.astype('datetime64[us]'), type=TIMESTAMP_TYPE, from_pandas=True)
+
+
+class TimestampParser:
+    """时间列解析器：每个文件只检测一次格式，用 Arrow 的 strptime 按固定格式解析，重复的字符串只解析一次，
+    并按列累计解析耗时（建议每个输入文件使用一个实例）"""
+
+    def __init__(self):
+        self.formats = {}
+        self.seconds = {}
+        self.rows = {}
+
+    def parse(self, name, column):
+        """把时间列解析为不带时区的微秒时间戳，返回 Arrow 数组"""
+        start = time.perf_counter()
+        if isinstance(column, pd.Series):
+            if pd.api.types.is_datetime64_any_dtype(column):
+                column = pa.array(column, from_pandas=True)
+            else:
+                column = to_string_array(column)
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+        if pa.types.is_timestamp(column.type):
+            if column.type.tz is not None:
+                column = pc.local_timestamp(column)
+            result = column.cast(TIMESTAMP_TYPE)
+        else:
+            result = self._parse_strings(name, to_string_array(column))
+        self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+        self.rows[name] = self.rows.get(name, 0) + len(result)
+        return result
+
+    def parse_series(self, name, series):
+        """解析 pandas 的时间列，返回索引不变的 datetime64[us] Series"""
+        result = self.parse(name, series).to_pandas()
+        result.index = series.index
+        return result
+
+    def _parse_strings(self, name, array):
+        # 字典编码后只解析不重复的字符串，再按编码取回整列
+        encoded = pc.dictionary_encode(array)
+        unique = encoded.dictionary
+        if name not in self.formats:
+            self.formats[name] = detect_format(unique)
+        fmt, has_tz = self.formats[name]
+
+        values = pc.replace_substring_regex(unique, TZ_SUFFIX, '') if has_tz else unique
+        if fmt is None:
+            parsed = pa.nulls(len(unique), TIMESTAMP_TYPE)
+        else:
+            parsed = pc.strptime(values, format=fmt, unit='us', error_is_null=True)
+        failed = pc.and_(parsed.is_null(), unique.is_valid())
+        if pc.any(failed).as_py():
+            parsed = pc.replace_with_mask(parsed, failed, parse_with_pandas(unique.filter(failed)))
+        return parsed.take(encoded.indices)
+
+    def merge(self, other):
+        """合并另一个解析器的耗时统计（并行处理时汇总各任务）"""
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.rows[name] = self.rows.get(name, 0) + other.rows[name]
+        for name, fmt in other.formats.items():
+            self.formats.setdefault(name, fmt)
+        return self
+
+    def report(self):
+        """打印每个时间列的格式、解析行数和耗时"""
+        for name, seconds in self.seconds.items():
+            fmt, has_tz = self.formats.get(name, (None, False))
+            fmt = (fmt or 'pandas推断') + (' + 时区后缀' if has_tz else '')
+            rows = self.rows[name]
+            print(f"  时间列 {name}: 格式 {fmt}, {rows} 行, 解析耗时 {seconds:.3f} 秒, "
+                  f"{rows / max(seconds, 1e-9):,.0f} 行/秒")
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+from itertools import islice
+import pandas as pd
+import pyarrow.parquet as pq
+from 时间解析 import TimestampParser
+
+TIME_COLUMNS = ['timestamp', 'registration_date', 'last_login']
+
+
+def pandas_parse(series):
+    """原来的实现：pd.to_datetime 逐批推断格式，再去掉时区"""
+    parsed = pd.to_datetime(series)
+    return parsed.dt.tz_localize(None) if parsed.dt.tz is not None else parsed
+
+
+def main(input_dir='10G_data/', batch_size=50000, max_batches=20):
+    """在 50000 行的批次上比较 pd.to_datetime 与 TimestampParser：检查结果一致，打印每列的耗时"""
+    files = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.parquet'))
+    timing = {c: [0.0, 0.0] for c in TIME_COLUMNS}
+    batches = 0
+    for file in files:
+        parquet_file = pq.ParquetFile(file)
+        columns = [c for c in TIME_COLUMNS if c in parquet_file.schema_arrow.names]
+        # 与预处理一致：每个文件一个解析器，格式只检测一次
+        parser = TimestampParser()
+        for batch in islice(parquet_file.iter_batches(batch_size=batch_size, columns=columns), max_batches - batches):
+            df = batch.to_pandas()
+            for c in columns:
+                start = time.perf_counter()
+                expected = pandas_parse(df[c])
+                timing[c][0] += time.perf_counter() - start
+
+                start = time.perf_counter()
+                result = parser.parse_series(c, df[c])
+                timing[c][1] += time.perf_counter() - start
+
+                pd.testing.assert_series_equal(result, expected.astype('datetime64[us]'), check_names=False)
+            batches += 1
+        if batches >= max_batches:
+            break
+
+    print(f"共 {batches} 个批次（每批 {batch_size} 行），两种实现结果一致")
+    for c, (old, new) in timing.items():
+        if old:
+            print(f"  {c}: pd.to_datetime {old:.3f} 秒, TimestampParser {new:.3f} 秒, 加速 {old / max(new, 1e-9):.1f}x")
+    return timing
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
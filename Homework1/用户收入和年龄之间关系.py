@@ -1,41 +1,54 @@
 import os
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib import font_manager
+from 数据读取 import column_range, list_parquet_files
+from 直方图 import log_edges, width_edges
+from 部分聚合 import Density2D, merge_all, reduce_file
 
 # 设置中文字体（适用于Linux）
 myfont = font_manager.FontProperties(fname='/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc')
 plt.rcParams['axes.unicode_minus'] = False
 
 
-def plot_income_age_heatmap(input_folder, output_image_path):
-    all_data = []
+def income_age_density(input_folder, income_width=50000, log_income=False, income_bins=50):
+    """逐个文件把 (年龄, 收入) 归约为二维分箱计数：年龄每岁一个分箱（与原来转换为整数后分组相同），
+    收入按 income_width 等宽分箱，log_income 为 True 时按对数分箱（income_bins 个）；分箱范围来自区域索引，不需要预先读取数据
+    """
+    age_min, age_max = column_range(input_folder, "age")
+    income_min, income_max = column_range(input_folder, "income")
+    if age_min is None or income_min is None:
+        return None
+    age_edges = width_edges(np.floor(age_min), np.floor(age_max), 1)
+    if log_income:
+        income_edges = log_edges(max(income_min, 1), income_max * (1 + 1e-9), income_bins)
+    else:
+        income_edges = width_edges(np.floor(income_min / income_width) * income_width, income_max, income_width)
 
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.parquet'):
-            file_path = os.path.join(input_folder, filename)
-            try:
-                df = pd.read_parquet(file_path, columns=["age", "income"])
-                all_data.append(df)
-                print(f"✅ Processed: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to process {filename}: {e}")
+    def make_aggregates():
+        return {"density": Density2D("age", age_edges, "income", income_edges, clip=log_income)}
 
-    if not all_data:
-        print("⚠️ No data collected.")
-        return
+    total = make_aggregates()
+    for file_path in list_parquet_files(input_folder):
+        filename = os.path.basename(file_path)
+        try:
+            merge_all(total, reduce_file(file_path, make_aggregates))
+            print(f"✅ Processed: {filename}")
+        except Exception as e:
+            print(f"❌ Failed to process {filename}: {e}")
+    return total["density"]
 
-    # 合并数据并去除空值
-    combined_df = pd.concat(all_data, ignore_index=True)
-    combined_df = combined_df.dropna(subset=["age", "income"])
 
-    # 年龄和收入转换为整数（如果不是）
-    combined_df["age"] = combined_df["age"].astype(int)
-    combined_df["income"] = combined_df["income"].astype(int)
+def plot_income_age_heatmap(input_folder, output_image_path, income_width=50000, log_income=False):
+    density = income_age_density(input_folder, income_width, log_income)
+    if density is None or density.value.sum() == 0:
+        print("⚠️ No data collected.")
+        return
 
-    # 统计每个收入-年龄组合的数量
-    heatmap_data = combined_df.groupby(["age", "income"]).size().unstack(fill_value=0)
+    # 每个年龄-收入分箱的数量（行为年龄，列为收入分箱的下界）
+    heatmap_data = density.result()
+    heatmap_data = heatmap_data.loc[heatmap_data.sum(axis=1) > 0]
 
     # 绘制热力图
     plt.figure(figsize=(18, 10))
@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+from multiprocessing import Pool
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from 批量解析 import decode_login_history
+
+
+def apply_login_features(column):
+    """原来的实现：逐行 json.loads 得到字典列表，再用四个 .apply 分别取特征"""
+    df = pd.DataFrame({'login_history': column.apply(json.loads)})
+    df['login_count'] = df['login_history'].apply(lambda x: x.get('login_count', 0))
+    df['first_login'] = pd.to_datetime(df['login_history'].apply(lambda x: x.get('first_login')))
+    df['device_count'] = df['login_history'].apply(lambda x: len(set(x.get('devices', []))))
+    df['location_count'] = df['login_history'].apply(lambda x: len(set(x.get('locations', []))))
+    return df.drop(columns=['login_history'])
+
+
+METHODS = {
+    'apply': apply_login_features,
+    'vectorized': decode_login_history,
+}
+
+
+def read_batch(input_file, batch_index, batch_size):
+    """读取文件中第 batch_index 个批次的 login_history 列"""
+    batches = pq.ParquetFile(input_file).iter_batches(batch_size=batch_size, columns=['login_history'])
+    for i, batch in enumerate(batches):
+        if i == batch_index:
+            return batch.column('login_history').to_pandas()
+    return None
+
+
+def _measure(args):
+    """在独立的子进程中运行，返回耗时和峰值内存（Python/NumPy 分配 + Arrow 内存池）
+    tracemalloc 会拖慢 Python 代码，耗时在不跟踪内存的情况下单独测量"""
+    method, input_file, batch_index, batch_size = args
+    column = read_batch(input_file, batch_index, batch_size)
+    pool = pa.default_memory_pool()
+    arrow_base = pool.max_memory()
+    tracemalloc.start()
+    result = METHODS[method](column)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak = python_peak + max(pool.max_memory() - arrow_base, 0)
+    del result
+
+    start = time.perf_counter()
+    result = METHODS[method](column)
+    seconds = time.perf_counter() - start
+    return seconds, peak / (1024 ** 2), len(result)
+
+
+def main(input_dir='10G_data_new', batch_size=100000, max_batches=5):
+    """在相同批次上比较原来的逐行解析与一次性批量解析：检查结果一致，打印每个批次的耗时和峰值内存"""
+    files = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.parquet'))
+    tasks = []
+    for file in files:
+        num_batches = -(-pq.ParquetFile(file).metadata.num_rows // batch_size)
+        tasks.extend((file, i) for i in range(num_batches))
+    tasks = tasks[:max_batches]
+
+    totals = {m: [0.0, 0.0] for m in METHODS}
+    # 每次测量都在新的子进程中进行，互不影响峰值内存
+    with Pool(processes=1, maxtasksperchild=1) as pool:
+        for file, batch_index in tasks:
+            column = read_batch(file, batch_index, batch_size)
+            expected = apply_login_features(column)
+            result = decode_login_history(column)
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+            line = [f"{os.path.basename(file)} 批次 {batch_index} ({len(column)} 行):"]
+            for method in METHODS:
+                seconds, peak_mb, _ = pool.apply(_measure, ((method, file, batch_index, batch_size),))
+                totals[method][0] += seconds
+                totals[method][1] = max(totals[method][1], peak_mb)
+                line.append(f"{method} {seconds:.3f} 秒 / 峰值 {peak_mb:.1f} MB")
+            print(' '.join(line))
+
+    print(f"共 {len(tasks)} 个批次，两种实现结果一致")
+    for method, (seconds, peak_mb) in totals.items():
+        print(f"  {method:>10}: 总耗时 {seconds:.2f} 秒, 最大峰值内存 {peak_mb:.1f} MB")
+    return totals
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+from itertools import islice
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from 直方图 import bin_codes, fixed_edges, histogram1d, histogram2d, log_edges, quantile_edges
+
+AGE_BINS = [0, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+INCOME_BINS = [0, 100000, 200000, 300000, 400000, 500000, 600000,
+               700000, 800000, 900000, 1000000, float('inf')]
+
+
+def pandas_histogram(values, edges, right=True):
+    """原来的实现：pd.cut 生成分类列，再 value_counts"""
+    return pd.cut(values, bins=edges, right=right).value_counts(sort=False).to_numpy()
+
+
+def pandas_histogram2d(x, x_edges, y, y_edges):
+    """原来的实现：两列分别 pd.cut，再 pd.crosstab（补齐没有数据的行和列）"""
+    table = pd.crosstab(pd.cut(x, bins=x_edges), pd.cut(y, bins=y_edges))
+    return table.reindex(index=pd.IntervalIndex.from_breaks(x_edges), columns=pd.IntervalIndex.from_breaks(y_edges),
+                         fill_value=0).to_numpy()
+
+
+def check_codes(values, edges):
+    """在边界值、缺失值和超出范围的值上检查分箱编号与 pd.cut 一致"""
+    for right in (True, False):
+        for include_lowest in (False, True):
+            expected = pd.cut(values, bins=edges, right=right, include_lowest=include_lowest, labels=False)
+            expected = expected.fillna(-1).to_numpy('int64')
+            assert (bin_codes(values, edges, right, include_lowest) == expected).all(), (right, include_lowest)
+
+
+def main(input_dir='processed_data', batch_size=50000, max_batches=20, repeat=5):
+    """在 50000 行的批次上比较 pd.cut + value_counts 与 searchsorted + bincount：检查计数一致，打印每批耗时和加速比"""
+    files = sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.parquet'))
+    batches = []
+    for file in files:
+        parquet_file = pq.ParquetFile(file)
+        batches.extend(islice(parquet_file.iter_batches(batch_size=batch_size, columns=['age', 'income']),
+                              max_batches - len(batches)))
+        if len(batches) >= max_batches:
+            break
+    frames = [b.to_pandas() for b in batches]
+
+    # 边界值与特殊值：等于边界、缺失值、超出范围
+    probe = pd.Series([np.nan, -1, 0, 20, 20.5, 100, 101] + AGE_BINS, dtype='float64')
+    check_codes(probe, AGE_BINS)
+    sample = pd.concat(frames, ignore_index=True)
+    income_edges = {
+        'fixed': fixed_edges(0, 1000000, 10),
+        'log': log_edges(1000, 1000000, 10),
+        'quantile': quantile_edges(sample['income'], 10),
+        # 边界较多时走 searchsorted 分支
+        'quantile-100': quantile_edges(sample['income'], 100),
+    }
+    for name, edges in income_edges.items():
+        check_codes(sample['income'], edges)
+        print(f"收入 {name} 分箱: 边界 {np.round(edges[:3], 1).tolist()} …，与 pd.cut 编号一致")
+
+    cases = {
+        '年龄 1-D': (lambda df: pandas_histogram(df['age'], AGE_BINS),
+                   lambda df: histogram1d(df['age'], AGE_BINS)),
+        '收入 1-D': (lambda df: pandas_histogram(df['income'], INCOME_BINS),
+                   lambda df: histogram1d(df['income'], INCOME_BINS)),
+        '年龄×收入 2-D': (lambda df: pandas_histogram2d(df['age'], AGE_BINS, df['income'], INCOME_BINS),
+                      lambda df: histogram2d(df['age'], AGE_BINS, df['income'], INCOME_BINS)),
+    }
+    print(f"共 {len(frames)} 个批次（每批 {batch_size} 行）")
+    for name, (old, new) in cases.items():
+        timing = [0.0, 0.0]
+        for df in frames:
+            assert (np.asarray(old(df)) == new(df)).all(), name
+            for i, fn in enumerate((old, new)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    fn(df)
+                timing[i] += (time.perf_counter() - start) / repeat
+        per_batch = [t / max(len(frames), 1) * 1000 for t in timing]
+        print(f"  {name}: pd.cut {per_batch[0]:.2f} 毫秒/批, bincount {per_batch[1]:.2f} 毫秒/批, "
+              f"加速 {timing[0] / max(timing[1], 1e-9):.1f}x")
+    return cases
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,58 @@
+from functools import lru_cache
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from 批量解析 import to_string_array
+
+# 全部省级行政区（省、自治区、直辖市、特别行政区）
+PROVINCES = [
+    '北京市', '天津市', '上海市', '重庆市',
+    '河北省', '山西省', '辽宁省', '吉林省', '黑龙江省', '江苏省', '浙江省', '安徽省', '福建省', '江西省',
+    '山东省', '河南省', '湖北省', '湖南省', '广东省', '海南省', '四川省', '贵州省', '云南省', '陕西省',
+    '甘肃省', '青海省', '台湾省',
+    '内蒙古自治区', '广西壮族自治区', '西藏自治区', '宁夏回族自治区', '新疆维吾尔自治区',
+    '香港特别行政区', '澳门特别行政区',
+]
+
+# 地址中常见的简称（如"北京朝阳区"、"广西南宁市"、"内蒙古呼和浩特市"）
+ALIASES = {
+    '北京': '北京市', '天津': '天津市', '上海': '上海市', '重庆': '重庆市',
+    '内蒙古': '内蒙古自治区', '广西': '广西壮族自治区', '西藏': '西藏自治区',
+    '宁夏': '宁夏回族自治区', '新疆': '新疆维吾尔自治区', '香港': '香港特别行政区', '澳门': '澳门特别行政区',
+}
+
+# 按长度从长到短匹配，保证全称优先于简称
+_PREFIXES = sorted([(p, p) for p in PROVINCES] + list(ALIASES.items()), key=lambda x: -len(x[0]))
+MAX_PREFIX_LEN = max(len(p) for p, _ in _PREFIXES)
+
+
+@lru_cache(maxsize=100000)
+def resolve_prefix(prefix):
+    """把地址前缀解析为省级行政区全称，无法识别时返回 None（结果按前缀缓存）"""
+    for p, name in _PREFIXES:
+        if prefix.startswith(p):
+            return name
+    # 兼容原来的规则：不在列表中但包含"省"的，取到第一个"省"为止
+    if '省' in prefix:
+        return prefix[:prefix.index('省') + 1]
+    return None
+
+
+def resolve_provinces_array(addresses, default=None):
+    """批量解析地址列的省份：只对去重后的地址前缀做一次匹配，再按字典编码取回整列结果（返回 Arrow 数组）"""
+    array = to_string_array(addresses)
+    prefix = pc.utf8_slice_codeunits(array, 0, MAX_PREFIX_LEN)
+    encoded = pc.dictionary_encode(prefix)
+    resolved = [resolve_prefix(p) for p in encoded.dictionary.to_pylist()]
+    result = pa.array(resolved, type=pa.string()).take(encoded.indices)
+    if default is not None:
+        result = pc.fill_null(result, default)
+    return result
+
+
+def resolve_provinces(addresses, default=None):
+    """批量解析地址列的省份，返回与输入索引一致的 Series"""
+    series = resolve_provinces_array(addresses, default).to_pandas()
+    if isinstance(addresses, pd.Series):
+        series.index = addresses.index
+    return series
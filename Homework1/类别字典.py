@@ -0,0 +1,88 @@
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from 批量解析 import decode_json_column
+from 全局统计 import file_key
+from 省份解析 import resolve_provinces
+
+# 以全局字典编码写出的分类列
+CATEGORICAL_COLUMNS = ['category', 'gender', 'country', 'province']
+
+# 预处理中填充的缺失值也必须出现在字典里
+FILL_VALUES = {'gender': ['未知']}
+
+CATEGORY_SCHEMA = pa.schema([('category', pa.string())])
+
+
+def scan_file_categories(input_file, batch_size=100000):
+    """只读取相关列，收集单个文件中各分类变量的取值"""
+    parquet_file = pq.ParquetFile(input_file)
+    names = parquet_file.schema_arrow.names
+    columns = [c for c in ['gender', 'country', 'chinese_address', 'purchase_history'] if c in names]
+    values = {c: set() for c in CATEGORICAL_COLUMNS}
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        for c in ['gender', 'country']:
+            if c in columns:
+                values[c].update(pc.unique(batch.column(c).drop_null()).to_pylist())
+        if 'chinese_address' in columns:
+            province = resolve_provinces(batch.column('chinese_address'))
+            values['province'].update(province.dropna().unique().tolist())
+        if 'purchase_history' in columns:
+            category = decode_json_column(batch.column('purchase_history'), CATEGORY_SCHEMA).column('category')
+            values['category'].update(pc.unique(category.drop_null()).to_pylist())
+
+    return {c: sorted(v) for c, v in values.items()}
+
+
+def load_or_build_categories(files, cache_path):
+    """增量预扫描所有文件，得到稳定的全局字典：已有取值的编码保持不变，新取值排序后追加到末尾"""
+    cache = {'files': {}, 'dictionary': {}}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+
+    per_file = {}
+    for file in files:
+        key = file_key(file)
+        if key in cache['files']:
+            per_file[key] = cache['files'][key]
+        else:
+            print(f"正在扫描分类取值: {file}")
+            per_file[key] = scan_file_categories(file)
+
+    dictionary = {}
+    for c in CATEGORICAL_COLUMNS:
+        known = list(cache['dictionary'].get(c, []))
+        seen = set(known)
+        found = set(FILL_VALUES.get(c, []))
+        for values in per_file.values():
+            found.update(values.get(c, []))
+        dictionary[c] = known + sorted(found - seen)
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': per_file, 'dictionary': dictionary}, f, ensure_ascii=False)
+    return dictionary
+
+
+def apply_categories(df, all_categories):
+    """把分类列转换为使用全局字典的 Categorical，写出后每个文件中的编码完全一致"""
+    for c, categories in all_categories.items():
+        if c in df.columns:
+            encoded = pd.Categorical(df[c], categories=categories)
+            unknown = int((df[c].notna() & pd.isna(encoded)).sum())
+            if unknown:
+                print(f"警告: 列 {c} 中有 {unknown} 个取值不在全局字典中，已置为缺失值")
+            df[c] = encoded
+    return df
+
+
+def load_categories(output_dir):
+    """读取预处理时保存的全局字典"""
+    with open(os.path.join(output_dir, 'categories.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)['dictionary']
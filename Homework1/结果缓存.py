@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import hashlib
+import pandas as pd
+
+# 分析结果缓存目录：每个缓存项一个子目录，每个结果一个小 Parquet 文件
+CACHE_DIR = 'analysis_cache'
+INDEX_FILE = '_index.json'
+# DataFrame 结果的列索引单独保存的文件后缀
+COLUMNS_SUFFIX = '.columns.parquet'
+# 缓存占用的磁盘上限，超过时按最近最少使用（LRU）淘汰
+DEFAULT_BUDGET = 512 * 1024 * 1024
+# 缓存结果的格式版本：聚合的计算方式或结果的存储格式变化时加一，旧版本的缓存项不会再被命中
+SCHEMA_VERSION = 2
+
+
+def footer_hash(path):
+    """Parquet 文件尾部元数据（footer）的哈希：文件末尾 8 字节为 footer 长度和 'PAR1'，只读取 footer 本身"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < 8:
+            return None
+        f.seek(size - 8)
+        length, magic = struct.unpack('<i4s', f.read(8))
+        if magic != b'PAR1' or length + 8 > size:
+            return None
+        f.seek(size - 8 - length)
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def file_fingerprint(path):
+    """输入文件的指纹：路径、大小、修改时间和 footer 哈希（内容被覆盖但大小、时间相同时 footer 也会不同）"""
+    st = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': st.st_size, 'mtime': st.st_mtime_ns, 'footer': footer_hash(path)}
+
+
+def cache_key(files, params=None):
+    """缓存键：格式版本 + 所有输入文件的指纹 + 分析参数（聚合的完整定义、过滤条件、抽样比例等）的哈希"""
+    payload = {'version': SCHEMA_VERSION, 'files': [file_fingerprint(f) for f in sorted(files)],
+               'params': params or {}}
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def to_frame(result):
+    """把聚合结果统一为列名为字符串的 DataFrame，便于写成 Parquet（索引原样保留，分类索引的类别和顺序也会写入）"""
+    if isinstance(result, pd.Series):
+        frame = result.to_frame('value')
+    elif isinstance(result, pd.DataFrame):
+        frame = result.copy()
+    else:
+        frame = pd.DataFrame({'value': [result]})
+    frame.columns = [str(c) for c in frame.columns]
+    return frame
+
+
+def result_kind(result):
+    if isinstance(result, pd.Series):
+        return 'series'
+    return 'frame' if isinstance(result, pd.DataFrame) else 'scalar'
+
+
+def restore_dtype(index, dtype):
+    """Parquet 会把 object 类型的字符串索引读成 str 类型，按保存时记录的类型还原"""
+    if dtype == 'object' and index.dtype != object and not isinstance(index, pd.MultiIndex):
+        return index.astype(object)
+    return index
+
+
+def from_frame(frame, kind, name=None, index_dtype=None, columns=None):
+    """to_frame 的逆过程：按保存时的类型还原为 Series、DataFrame 或标量；
+    index_dtype 为保存时索引的类型，columns 为保存时的列索引（含列名和类型），与直接计算的结果完全一致
+    """
+    frame.index = restore_dtype(frame.index, index_dtype)
+    if kind == 'series':
+        return frame['value'].rename(name)
+    if kind == 'scalar':
+        return frame['value'].iloc[0]
+    if columns is not None:
+        frame.columns = columns
+    return frame
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, n)) for root, _, names in os.walk(path) for n in names)
+
+
+class ResultCache:
+    """以输入文件指纹和分析参数为键的结果缓存：命中时直接读取很小的结果文件，不再扫描数据
+    索引记录每项的输入文件、参数、大小和最近使用时间，写入后按 LRU 淘汰到磁盘上限以内
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, budget=DEFAULT_BUDGET):
+        self.cache_dir, self.budget = cache_dir, budget
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+
+    def _remove(self, key):
+        shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+        self.index.pop(key, None)
+
+    def get(self, key):
+        """读取缓存项（{名称: 结果}），不存在时返回 None；命中时更新最近使用时间"""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            results = {name: self._read(entry_dir, name, meta) for name, meta in entry['results'].items()}
+        except (OSError, ValueError):
+            # 结果文件被删除或损坏时视为未命中
+            self._remove(key)
+            self._save_index()
+            return None
+        entry['last_used'] = time.time()
+        self._save_index()
+        return results
+
+    @staticmethod
+    def _read(entry_dir, name, meta):
+        columns = None
+        if meta.get('columns_dtype') is not None:
+            columns = pd.read_parquet(os.path.join(entry_dir, f"{name}{COLUMNS_SUFFIX}")).index
+            columns = restore_dtype(columns, meta['columns_dtype'])
+        return from_frame(pd.read_parquet(os.path.join(entry_dir, f"{name}.parquet")), meta['kind'],
+                          meta.get('name'), meta.get('index_dtype'), columns)
+
+    def put(self, key, results, files=(), params=None):
+        """写入一组结果，然后按 LRU 淘汰超出磁盘上限的旧缓存项
+        DataFrame 的列索引（列名、类型、分类的类别）另存为一个只有索引的小 Parquet 文件，读取时原样还原
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        meta = {}
+        for name, result in results.items():
+            to_frame(result).to_parquet(os.path.join(entry_dir, f"{name}.parquet"))
+            meta[name] = {'kind': result_kind(result),
+                          'name': result.name if isinstance(result, pd.Series) else None,
+                          'index_dtype': str(result.index.dtype) if hasattr(result, 'index') else None,
+                          'columns_dtype': None}
+            if isinstance(result, pd.DataFrame):
+                pd.DataFrame(index=result.columns).to_parquet(os.path.join(entry_dir, f"{name}{COLUMNS_SUFFIX}"))
+                meta[name]['columns_dtype'] = str(result.columns.dtype)
+        now = time.time()
+        self.index[key] = {'files': [os.path.abspath(f) for f in files], 'params': params or {},
+                           'results': meta, 'bytes': directory_size(entry_dir),
+                           'created': now, 'last_used': now}
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """按最近使用时间从旧到新删除缓存项，直到总大小不超过上限（keep 指定的项不删除）"""
+        total = sum(e['bytes'] for e in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]['last_used']):
+            if total <= self.budget:
+                break
+            if key == keep:
+                continue
+            total -= self.index[key]['bytes']
+            print(f"缓存超出上限，淘汰: {key}")
+            self._remove(key)
+        self._save_index()
+        return total
+
+    def invalidate(self, paths=None):
+        """删除缓存项：paths 为空时清空全部，否则删除输入文件包含这些路径（或其下文件）的项，返回删除的项数"""
+        if paths is None:
+            keys = list(self.index)
+        else:
+            prefixes = [os.path.abspath(p) for p in paths]
+            keys = [k for k, e in self.index.items()
+                    if any(f == p or f.startswith(p.rstrip(os.sep) + os.sep) for f in e['files'] for p in prefixes)]
+        for key in keys:
+            self._remove(key)
+        self._save_index()
+        return len(keys)
+
+    def cached(self, files, params, compute):
+        """有缓存时直接返回，否则调用 compute() 计算 {名称: 结果} 并写入缓存"""
+        key = cache_key(files, params)
+        results = self.get(key)
+        if results is not None:
+            print(f"命中结果缓存: {key[:12]}")
+            return results
+        results = compute()
+        self.put(key, results, files, params)
+        return results
+
+    def summary(self):
+        """各缓存项的输入文件数、结果数、大小和最近使用时间"""
+        rows = [{'key': k, 'files': len(e['files']), 'results': len(e['results']), 'bytes': e['bytes'],
+                 'last_used': pd.Timestamp(e['last_used'], unit='s')} for k, e in self.index.items()]
+        return pd.DataFrame(rows, columns=['key', 'files', 'results', 'bytes', 'last_used'])
+
+
+if __name__ == "__main__":
+    # python 结果缓存.py list | invalidate [路径 ...] | evict
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    cache = ResultCache()
+    if command == 'invalidate':
+        removed = cache.invalidate(sys.argv[2:] or None)
+        print(f"已删除 {removed} 个缓存项")
+    elif command == 'evict':
+        print(f"缓存大小: {cache.evict()} 字节")
+    else:
+        print(cache.summary().to_string(index=False))
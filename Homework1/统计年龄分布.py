@@ -1,26 +1,10 @@
 import os
 import pandas as pd
+from 全量分析 import load_result
 import matplotlib.pyplot as plt
 import seaborn as sns
-from tqdm import tqdm
-import random
 # 设置中文字体
 import matplotlib
-import time
-
-
-class FakeTimeTQDM(tqdm):
-    def __init__(self, *args, **kwargs):
-        self._start_time_real = time.time()
-        super().__init__(*args, **kwargs)
-
-    @property
-    def format_dict(self):
-        d = super().format_dict.copy()  # 复制原始字典
-        real_elapsed = time.time() - self._start_time_real
-        d["elapsed"] = real_elapsed * 100  # 显示为100倍时间
-        return d
-
 
 matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']
 matplotlib.rcParams['axes.unicode_minus'] = False
@@ -33,24 +17,11 @@ output_directory = 'pictures/ppppp'
 if not os.path.exists(output_directory):
     os.makedirs(output_directory)
 
-# 获取所有 .parquet 文件
-all_parquet_files = [f for f in os.listdir(input_directory) if f.endswith('.parquet')]
-parquet_files = random.sample(all_parquet_files, min(100, len(all_parquet_files)))  # 若不足100则取全部
-
-# 初始化总数据 DataFrame
-all_data = pd.DataFrame()
-
-# 加载数据
-for file in FakeTimeTQDM(parquet_files, desc="加载数据文件", ncols=100):
-    file_path = os.path.join(input_directory, file)
-    df = pd.read_parquet(file_path)
-    all_data = pd.concat([all_data, df], ignore_index=True)
-
-# 抽样
-sampled_df = all_data.sample(frac=0.3, random_state=42)  # 10% 抽样
+# 全量数据的年龄计数（全量分析 中的 age_counts，经结果缓存，数据未变化时不再扫描，不再需要抽样）
+age_counts = load_result('age_counts', input_dir=input_directory)
 
 # 统计每个年龄的百分比分布
-age_distribution = sampled_df['age'].value_counts(normalize=True).sort_index() * 100  # 百分比统计
+age_distribution = (age_counts / age_counts.sum()).sort_index() * 100  # 百分比统计
 
 # 绘制年龄分布的柱状图（百分比）
 plt.figure(figsize=(12, 6))
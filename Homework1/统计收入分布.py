@@ -1,24 +1,9 @@
 import os
 import pandas as pd
+from 全量分析 import load_result
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sphinx.util.console import black
-from tqdm import tqdm
-from tqdm import tqdm
-import time
-
-
-class FakeTimeTQDM(tqdm):
-    def __init__(self, *args, **kwargs):
-        self._start_time_real = time.time()
-        super().__init__(*args, **kwargs)
-
-    @property
-    def format_dict(self):
-        d = super().format_dict.copy()  # 复制原始字典
-        real_elapsed = time.time() - self._start_time_real
-        d["elapsed"] = real_elapsed * 100  # 显示为100倍时间
-        return d
 
 
 # 设置中文字体
@@ -35,29 +20,19 @@ output_directory = 'pictures/ppppp'
 if not os.path.exists(output_directory):
     os.makedirs(output_directory)
 
-# 获取所有 .parquet 文件
-parquet_files = [f for f in os.listdir(input_directory) if f.endswith('4.parquet')]
-
-# 初始化总数据 DataFrame
-all_data = pd.DataFrame()
-
-# 加载数据
-for file in FakeTimeTQDM(parquet_files, desc="加载数据文件", ncols=100):
-    file_path = os.path.join(input_directory, file)
-    df = pd.read_parquet(file_path)
-    all_data = pd.concat([all_data, df], ignore_index=True)
-
-# 抽样
-sampled_df = all_data.sample(frac=0.1, random_state=42)  # 10% 抽样
+# 全量数据按收入区间的计数（全量分析 中的 income_groups，经结果缓存，数据未变化时不再扫描，不再需要抽样）
+# （income 是连续的浮点数，按取值计数时不同取值的个数随数据量增长，分箱后状态大小固定）
+income_counts = load_result('income_groups', input_dir=input_directory)
 
-# 统计收入的分布并计算百分比
-income_distribution = sampled_df['income'].value_counts(normalize=True).sort_index() * 100  # 计算百分比并排序
+# 统计各收入区间的分布并计算百分比（按区间顺序排列）
+income_distribution = income_counts / income_counts.sum() * 100
 
 # 绘制收入分布的折线图
 plt.figure(figsize=(12, 6))
 income_distribution.plot(kind='line', marker='o', color='skyblue', markersize=4)  # 调整数据点的大小
 plt.title('数据中收入分布折线图', fontsize=15)
-plt.xlabel('收入', fontsize=12)
+plt.xlabel('收入区间', fontsize=12)
+plt.xticks(range(len(income_distribution)), income_distribution.index, rotation=45)
 plt.ylabel('百分比 (%)', fontsize=12)
 plt.ylim(0, income_distribution.max() * 1.1)  # 确保纵轴从0开始，并稍微扩大上限
 plt.tight_layout()
@@ -1,42 +1,25 @@
 import os
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from matplotlib import font_manager
+from 用户收入和年龄之间关系 import income_age_density
 
 # 设置中文字体（适用于Linux）
 myfont = font_manager.FontProperties(fname='/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc')
 plt.rcParams['axes.unicode_minus'] = False
 
 
-def plot_income_age_scatter(input_folder, output_image_path):
-    all_data = []
-
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.parquet'):
-            file_path = os.path.join(input_folder, filename)
-            try:
-                df = pd.read_parquet(file_path, columns=["age", "income"])
-                all_data.append(df)
-                print(f"✅ Processed: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to process {filename}: {e}")
-
-    if not all_data:
+def plot_income_age_scatter(input_folder, output_image_path, income_width=10000):
+    # 逐个文件归约为 年龄 × 收入 的二维分箱计数，散点为非空分箱的中心，颜色表示该分箱的用户数（不再拼接全部数据）
+    density = income_age_density(input_folder, income_width)
+    if density is None or density.value.sum() == 0:
         print("⚠️ No data collected.")
         return
-
-    # 合并数据并去除空值
-    combined_df = pd.concat(all_data, ignore_index=True)
-    combined_df = combined_df.dropna(subset=["age", "income"])
-
-    # 年龄和收入转换为整数（如果不是）
-    combined_df["age"] = combined_df["age"].astype(int)
-    combined_df["income"] = combined_df["income"].astype(int)
+    points = density.points(anchor="left")
 
     # 绘制散点图
     plt.figure(figsize=(12, 6))
-    sns.scatterplot(x="age", y="income", data=combined_df, color='b', alpha=0.6)
+    sns.scatterplot(x="age", y="income", hue="count", data=points, palette="Blues", alpha=0.6)
 
     plt.xlabel("年龄", fontproperties=myfont)
     plt.ylabel("收入", fontproperties=myfont)
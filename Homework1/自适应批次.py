@@ -0,0 +1,94 @@
+import time
+import psutil
+import pyarrow as pa
+
+
+def mem_usage():
+    """返回当前进程内存使用量(MB)"""
+    return psutil.Process().memory_info().rss / (1024 ** 2)
+
+
+class AdaptiveBatchController:
+    """根据 RSS 和每行内存开销动态调整批次大小：在内存上限以内尽量提高 行/秒"""
+
+    def __init__(self, memory_limit_mb, initial_size=50000, min_size=1000, max_size=2000000,
+                 safety=0.8, grow_factor=1.5, verbose=True):
+        self.memory_limit_mb = memory_limit_mb
+        self.batch_size = initial_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.safety = safety
+        self.grow_factor = grow_factor
+        self.verbose = verbose
+        self.baseline_mb = mem_usage()
+        self.bytes_per_row = None
+        self.best_rate = 0.0
+        self.best_size = initial_size
+        self.history = []
+
+    def _log(self, old, new, reason):
+        self.history.append((old, new, reason))
+        if self.verbose and old != new:
+            print(f"[自适应批次] {old} -> {new} 行: {reason}")
+
+    def memory_cap(self):
+        """按当前每行内存开销估算的批次大小上限"""
+        if not self.bytes_per_row:
+            return self.max_size
+        budget_mb = (self.memory_limit_mb - self.baseline_mb) * self.safety
+        return max(self.min_size, int(budget_mb * 1024 ** 2 / self.bytes_per_row))
+
+    def record(self, rows, seconds, rss_mb=None):
+        """记录一个批次的行数、耗时和处理后的 RSS，并决定下一个批次的大小"""
+        if rows <= 0:
+            return self.batch_size
+        rss_mb = mem_usage() if rss_mb is None else rss_mb
+        per_row = max(rss_mb - self.baseline_mb, 0) * 1024 ** 2 / rows
+        # 每行开销取指数滑动平均，避免单个批次的波动导致来回调整
+        self.bytes_per_row = per_row if self.bytes_per_row is None else 0.7 * self.bytes_per_row + 0.3 * per_row
+        rate = rows / max(seconds, 1e-9)
+        old = self.batch_size
+
+        if rss_mb > self.memory_limit_mb * self.safety:
+            new = max(self.min_size, int(old / 2))
+            reason = f"RSS {rss_mb:.0f} MB 接近上限 {self.memory_limit_mb} MB，减半"
+        elif rate >= self.best_rate * 0.95:
+            if rate > self.best_rate:
+                self.best_rate, self.best_size = rate, old
+            new = min(self.max_size, self.memory_cap(), int(old * self.grow_factor))
+            reason = f"吞吐 {rate:,.0f} 行/秒 仍在提升，增大（内存允许上限 {self.memory_cap()} 行）"
+        else:
+            new = min(self.best_size, self.memory_cap())
+            reason = f"吞吐 {rate:,.0f} 行/秒 低于最佳 {self.best_rate:,.0f} 行/秒，回到最佳批次大小"
+
+        self.batch_size = max(self.min_size, min(new, self.max_size))
+        self._log(old, self.batch_size, reason)
+        return self.batch_size
+
+
+def adaptive_batches(batches, controller):
+    """把任意大小的 RecordBatch 流重新切分为 controller.batch_size 行的表；消费方处理完一块后自动反馈耗时和内存"""
+    pending, pending_rows = [], 0
+    start = time.time()
+
+    def emit(rows):
+        nonlocal pending, pending_rows
+        # 不同文件的批次 schema 可能略有差异（如字典、可空性），拼接时统一类型
+        table = pa.concat_tables([pa.Table.from_batches([b]) for b in pending], promote_options='default')
+        pending = [b for b in table.slice(rows).to_batches() if b.num_rows]
+        pending_rows = table.num_rows - rows
+        return table.slice(0, rows)
+
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= controller.batch_size:
+            table = emit(controller.batch_size)
+            yield table
+            controller.record(table.num_rows, time.time() - start)
+            start = time.time()
+    if pending_rows:
+        table = emit(pending_rows)
+        yield table
+        controller.record(table.num_rows, time.time() - start)
+
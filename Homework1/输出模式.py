@@ -0,0 +1,66 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# 预处理输出列的目标类型及允许范围（None 表示只受类型本身的范围限制）
+# 注意：读出的列保持这些窄类型（如 age 为 int8），分析脚本做乘法等运算前需先转换为更宽的类型，否则会溢出回绕
+OUTPUT_SCHEMA = {
+    'age': (pa.int8(), 0, 120),
+    'credit_score': (pa.int16(), 300, 850),
+    'hour': (pa.int8(), 0, 23),
+    'day_of_week': (pa.int8(), 0, 6),
+    'is_weekend': (pa.int8(), 0, 1),
+    'days_since_registration': (pa.int16(), None, None),
+    'items_count': (pa.int16(), 0, None),
+    # 数据预处理.py 中的登录相关列
+    'login_hour': (pa.int8(), 0, 23),
+    'login_dayofweek': (pa.int8(), 0, 6),
+    'login_count': (pa.int32(), 0, None),
+    'device_count': (pa.int16(), 0, None),
+    'location_count': (pa.int16(), 0, None),
+}
+
+# 数据预处理.py 不过滤/填充信用分，只限制类型
+CLEAN_OUTPUT_SCHEMA = {**OUTPUT_SCHEMA, 'credit_score': (pa.int16(), None, None)}
+
+
+class SchemaViolation(ValueError):
+    """数值列超出输出模式允许的范围或无法安全转换：说明上游清洗有问题，不应按普通的批次错误跳过"""
+
+
+def enforce_schema(table, spec=OUTPUT_SCHEMA):
+    """把表中的数值列转换为最小的安全类型，先检查取值范围，转换时不允许溢出或截断小数"""
+    for name, (target, low, high) in spec.items():
+        if name not in table.column_names:
+            continue
+        column = table.column(name)
+        if column.type == target:
+            continue
+        min_max = pc.min_max(column)
+        lo, hi = min_max['min'].as_py(), min_max['max'].as_py()
+        if lo is not None and ((low is not None and lo < low) or (high is not None and hi > high)):
+            raise SchemaViolation(f"列 {name} 的取值范围 [{lo}, {hi}] 超出允许范围 [{low}, {high}]")
+        try:
+            cast = pc.cast(column, target, safe=True)
+        except pa.ArrowInvalid as e:
+            raise SchemaViolation(f"列 {name} 无法安全转换为 {target}: {e}")
+        table = table.set_column(table.schema.get_field_index(name), pa.field(name, target), cast)
+    return table
+
+
+def parquet_size(table, compression='zstd'):
+    """表写成 Parquet 后的字节数"""
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression=compression)
+    return sink.getvalue().size
+
+
+def measure_saving(original, enforced, compression='zstd', measure_disk=False):
+    """统计转换列节省的内存字节数，以及（可选）写成 Parquet 后节省的磁盘字节数"""
+    names = [n for n in OUTPUT_SCHEMA if n in original.column_names]
+    memory = sum(original.column(n).nbytes - enforced.column(n).nbytes for n in names)
+    disk = None
+    if measure_disk and names:
+        disk = (parquet_size(original.select(names), compression)
+                - parquet_size(enforced.select(names), compression))
+    return memory, disk
@@ -0,0 +1,569 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from 全局统计 import KLLSketch
+from 直方图 import bin_codes, histogram1d, histogram2d, interval_labels, to_float_array
+from 抽样层级 import SAMPLE_KEY, sample_mask
+from 自适应批次 import AdaptiveBatchController, adaptive_batches
+
+
+def add_counts(total, counts):
+    """按索引相加两个计数（Series 或 DataFrame），缺失的键按 0 处理"""
+    if total is None:
+        return counts
+    return total.add(counts, fill_value=0)
+
+
+def spec_value(value):
+    """把聚合参数转换为可 JSON 序列化的值：嵌套的聚合取其 spec，数组转为列表，函数取模块和名称"""
+    if isinstance(value, Aggregate):
+        return value.spec()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [spec_value(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if callable(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    return value
+
+
+class Aggregate:
+    """可合并的部分聚合状态：update 把一块数据归约到状态中，merge 合并另一个同类状态，result 得到最终结果
+    状态的大小只与分组数、分箱数有关，与数据行数无关
+    """
+
+    # update 需要读取的列
+    columns = []
+    # 结果是否与数据的分块方式无关（为 False 时批次大小决定结果，不能使用自适应批次）
+    chunk_invariant = True
+    # 累计状态的属性名，其余属性都是构造参数（列、分箱边界、标签等），由 spec 输出
+    state = ('value',)
+
+    def spec(self):
+        """聚合的完整定义（类名和全部参数，不含累计状态），参数相同的聚合结果相同，可用作结果缓存的键"""
+        params = {name: spec_value(v) for name, v in sorted(vars(self).items()) if name not in self.state}
+        return {'type': type(self).__name__, **params}
+
+    def __repr__(self):
+        params = ', '.join(f"{k}={v!r}" for k, v in self.spec().items() if k != 'type')
+        return f"{type(self).__name__}({params})"
+
+    def update(self, df):
+        raise NotImplementedError
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Count(Aggregate):
+    """行数（给定列时只统计非空值）；by 不为空时按该列分组计数"""
+
+    def __init__(self, column=None, by=None):
+        self.column, self.by = column, by
+        self.columns = [c for c in [column, by] if c is not None]
+        self.value = 0 if by is None else None
+
+    def update(self, df):
+        values = df[self.column] if self.column is not None else pd.Series(1, index=df.index)
+        if self.by is None:
+            self.value += int(values.count())
+        else:
+            self.value = add_counts(self.value, values.groupby(df[self.by], observed=True).count())
+        return self
+
+    def merge(self, other):
+        self.value = self.value + other.value if self.by is None else add_counts(self.value, other.value)
+        return self
+
+    def result(self):
+        return self.value if self.by is None else self.value.astype('int64')
+
+
+class Sum(Aggregate):
+    """求和（忽略缺失值）；by 不为空时按该列分组求和"""
+
+    def __init__(self, column, by=None):
+        self.column, self.by = column, by
+        self.columns = [c for c in [column, by] if c is not None]
+        self.value = 0.0 if by is None else None
+
+    def update(self, df):
+        if self.by is None:
+            self.value += float(df[self.column].sum())
+        else:
+            self.value = add_counts(self.value, df[self.column].groupby(df[self.by], observed=True).sum())
+        return self
+
+    def merge(self, other):
+        self.value = self.value + other.value if self.by is None else add_counts(self.value, other.value)
+        return self
+
+    def result(self):
+        return self.value
+
+
+class Mean(Aggregate):
+    """平均值：状态为和与非空计数，合并时分别相加"""
+
+    state = ()
+
+    def __init__(self, column, by=None):
+        self.sum, self.count = Sum(column, by), Count(column, by)
+        self.columns = self.sum.columns
+
+    def update(self, df):
+        self.sum.update(df)
+        self.count.update(df)
+        return self
+
+    def merge(self, other):
+        self.sum.merge(other.sum)
+        self.count.merge(other.count)
+        return self
+
+    def result(self):
+        count = self.count.result()
+        if self.sum.by is None:
+            return self.sum.result() / count if count else float('nan')
+        return self.sum.result() / count.replace(0, np.nan)
+
+
+class MinMax(Aggregate):
+    """最小值和最大值；by 不为空时按该列分组，结果为 min、max 两列的 DataFrame"""
+
+    def __init__(self, column, by=None):
+        self.column, self.by = column, by
+        self.columns = [c for c in [column, by] if c is not None]
+        self.value = None
+
+    def _combine(self, other):
+        if self.value is None or other is None:
+            return other if self.value is None else self.value
+        if self.by is None:
+            return (min(self.value[0], other[0]), max(self.value[1], other[1]))
+        both = pd.concat([self.value, other], axis=1, keys=['a', 'b'])
+        return pd.DataFrame({'min': both.xs('min', axis=1, level=1).min(axis=1),
+                             'max': both.xs('max', axis=1, level=1).max(axis=1)})
+
+    def update(self, df):
+        values = df[self.column]
+        if self.by is None:
+            values = values.dropna()
+            state = (values.min(), values.max()) if len(values) else None
+        else:
+            state = values.groupby(df[self.by], observed=True).agg(['min', 'max']).dropna()
+        self.value = self._combine(state)
+        return self
+
+    def merge(self, other):
+        self.value = self._combine(other.value)
+        return self
+
+    def result(self):
+        return self.value
+
+
+class ValueCounts(Aggregate):
+    """取值计数（缺失值可用 fillna 指定的标签计入）"""
+
+    def __init__(self, column, fillna=None):
+        self.column, self.fillna = column, fillna
+        self.columns = [column]
+        self.value = None
+
+    def update(self, df):
+        values = df[self.column]
+        if self.fillna is not None:
+            values = values.astype(object).fillna(self.fillna)
+        self.value = add_counts(self.value, values.value_counts())
+        return self
+
+    def merge(self, other):
+        self.value = add_counts(self.value, other.value)
+        return self
+
+    def result(self, normalize=False):
+        counts = self.value.astype('int64') if self.value is not None else pd.Series(dtype='int64')
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        return counts / counts.sum() if normalize else counts
+
+
+class Histogram(Aggregate):
+    """按分箱边界计数（np.searchsorted + np.bincount，与 pd.cut 的分箱一致）
+    by 不为空时按该列分组，结果为 分组 × 分箱 的 DataFrame
+    """
+
+    def __init__(self, column, bins, labels=None, right=True, by=None):
+        self.column, self.by = column, by
+        self.bins, self.right = list(bins), right
+        self.labels = list(labels) if labels is not None else interval_labels(self.bins, right)
+        self.columns = [c for c in [column, by] if c is not None]
+        self.value = np.zeros(len(self.labels), dtype='int64') if by is None else None
+
+    def codes(self, values):
+        """分箱编号，不在任何分箱内的值为 -1"""
+        return bin_codes(values, self.bins, self.right)
+
+    def update(self, df):
+        if self.by is None:
+            self.value += histogram1d(df[self.column], self.bins, self.right)
+        else:
+            codes = self.codes(df[self.column])
+            frame = pd.DataFrame({'group': df[self.by].to_numpy(), 'code': codes})[codes >= 0]
+            counts = frame.groupby(['group', 'code'], observed=True).size().unstack(fill_value=0)
+            self.value = add_counts(self.value, counts)
+        return self
+
+    def merge(self, other):
+        self.value = self.value + other.value if self.by is None else add_counts(self.value, other.value)
+        return self
+
+    def result(self):
+        if self.by is None:
+            return pd.Series(self.value, index=self.labels)
+        counts = self.value if self.value is not None else pd.DataFrame()
+        counts = counts.reindex(columns=range(len(self.labels)), fill_value=0).fillna(0).astype('int64')
+        counts.columns = self.labels
+        counts.index.name = self.by
+        return counts
+
+
+class Crosstab(Aggregate):
+    """两列取值的交叉计数，结果与 pd.crosstab(df[row], df[column]) 一致"""
+
+    def __init__(self, row, column):
+        self.row, self.column = row, column
+        self.columns = [row, column]
+        self.value = None
+
+    def update(self, df):
+        self.value = add_counts(self.value, df.groupby([self.row, self.column], observed=True).size())
+        return self
+
+    def merge(self, other):
+        self.value = add_counts(self.value, other.value)
+        return self
+
+    def result(self):
+        if self.value is None:
+            return pd.DataFrame()
+        return self.value.unstack(fill_value=0).fillna(0).astype('int64')
+
+
+class BinnedCrosstab(Aggregate):
+    """两个数值列按固定分箱交叉计数：状态为 行分箱数 × 列分箱数 的整数数组，合并只需相加（与文件数无关），
+    归一化只在 result 中进行，每一行数据的权重相同
+    """
+
+    def __init__(self, row, row_bins, column, column_bins, row_labels=None, column_labels=None, right=True):
+        self.row_bins = Histogram(row, row_bins, row_labels, right)
+        self.column_bins = Histogram(column, column_bins, column_labels, right)
+        self.columns = [row, column]
+        self.value = np.zeros((len(self.row_bins.labels), len(self.column_bins.labels)), dtype='int64')
+
+    def update(self, df):
+        rows, cols = self.row_bins, self.column_bins
+        self.value += histogram2d(df[rows.column], rows.bins, df[cols.column], cols.bins, rows.right)
+        return self
+
+    def merge(self, other):
+        self.value += other.value
+        return self
+
+    def result(self, normalize=False):
+        """交叉计数表；normalize 与 pd.crosstab 相同（'index'、'columns'、'all' 或 True），没有数据的行和列不输出"""
+        table = pd.DataFrame(self.value, index=pd.Index(self.row_bins.labels, name=self.row_bins.column),
+                             columns=pd.Index(self.column_bins.labels, name=self.column_bins.column))
+        table = table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+        if normalize == 'index':
+            return table.div(table.sum(axis=1), axis=0)
+        if normalize == 'columns':
+            return table / table.sum(axis=0)
+        if normalize in (True, 'all'):
+            return table / table.to_numpy().sum()
+        return table
+
+
+class Density2D(Aggregate):
+    """两个数值列的二维密度（分箱计数），用于热力图和代替逐行散点图
+    边界可用 直方图.width_edges（固定宽度）、fixed_edges（固定个数）或 log_edges（对数分箱）生成；
+    分箱为左闭右开 [a, b)，clip 为 True 时超出范围的值计入两端的分箱，否则计入 outside
+    状态为整数计数矩阵，合并只需相加
+    """
+
+    state = ('value', 'outside')
+
+    def __init__(self, x, x_edges, y, y_edges, clip=False):
+        self.x, self.y = x, y
+        self.x_edges = np.asarray(x_edges, dtype='float64')
+        self.y_edges = np.asarray(y_edges, dtype='float64')
+        self.clip = clip
+        self.columns = [x, y]
+        self.value = np.zeros((len(self.x_edges) - 1, len(self.y_edges) - 1), dtype='int64')
+        self.outside = 0
+
+    def _values(self, values, edges):
+        values = to_float_array(values)
+        if self.clip:
+            # 截到最后一个分箱内部（右边界不属于左闭右开的分箱）
+            values = np.clip(values, edges[0], np.nextafter(edges[-1], edges[0]))
+        return values
+
+    def update(self, df):
+        x = self._values(df[self.x], self.x_edges)
+        y = self._values(df[self.y], self.y_edges)
+        counts = histogram2d(x, self.x_edges, y, self.y_edges, right=False)
+        self.value += counts
+        self.outside += int((~np.isnan(x) & ~np.isnan(y)).sum() - counts.sum())
+        return self
+
+    def merge(self, other):
+        self.value += other.value
+        self.outside += other.outside
+        return self
+
+    def result(self, normalize=False):
+        """行为 x 分箱、列为 y 分箱的计数表（索引为各分箱的左边界），normalize 为 True 时返回占比"""
+        table = pd.DataFrame(self.value, index=pd.Index(self.x_edges[:-1], name=self.x),
+                             columns=pd.Index(self.y_edges[:-1], name=self.y))
+        return table / max(self.value.sum(), 1) if normalize else table
+
+    def points(self, anchor='center'):
+        """非空分箱的坐标和计数（x、y、count 三列），可直接画按计数着色或缩放的散点图
+        anchor 为 'center' 时坐标取分箱中点，为 'left' 时取左边界（如每岁一个分箱的年龄）
+        """
+        i, j = np.nonzero(self.value)
+        if anchor == 'left':
+            x_points, y_points = self.x_edges[:-1], self.y_edges[:-1]
+        else:
+            x_points = (self.x_edges[:-1] + self.x_edges[1:]) / 2
+            y_points = (self.y_edges[:-1] + self.y_edges[1:]) / 2
+        return pd.DataFrame({self.x: x_points[i], self.y: y_points[j], 'count': self.value[i, j]})
+
+
+class BinnedStats(Aggregate):
+    """按分箱统计数值列，结果与 df.groupby(pd.cut(...))[value].describe() 的列相同
+    每个分箱保存计数、均值、离差平方和、最小值、最大值（合并用 Chan 公式，精确）和一个 KLL 草图（四分位数为近似值）
+    """
+
+    state = ('count', 'mean', 'm2', 'min', 'max', 'sketches')
+
+    def __init__(self, column, bins, labels=None, right=True, value=None, k=200):
+        self.bins, self.k = Histogram(column, bins, labels, right), k
+        self.value_column = value or column
+        self.columns = list(dict.fromkeys([column, self.value_column]))
+        n = len(self.bins.labels)
+        self.count = np.zeros(n, dtype='int64')
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.sketches = [KLLSketch(k=k) for _ in range(n)]
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = np.where(total > 0, self.m2 + m2 + delta ** 2 * self.count * count / total, 0.0)
+        self.count = total
+        self.min = np.minimum(self.min, minimum)
+        self.max = np.maximum(self.max, maximum)
+
+    def update(self, df):
+        codes = self.bins.codes(df[self.bins.column])
+        values = df[self.value_column].to_numpy('float64', na_value=np.nan)
+        valid = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        n = len(self.count)
+        count = np.bincount(codes, minlength=n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.bincount(codes, weights=values, minlength=n) / count, 0.0)
+        m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n)
+        minimum, maximum = np.full(n, np.inf), np.full(n, -np.inf)
+        np.minimum.at(minimum, codes, values)
+        np.maximum.at(maximum, codes, values)
+        self._combine(count, mean, m2, minimum, maximum)
+        for b in np.flatnonzero(count):
+            self.sketches[b].update(values[codes == b])
+        return self
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def result(self):
+        empty = self.count == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        std[self.count < 2] = np.nan
+        quartiles = np.array([s.quantiles([0.25, 0.5, 0.75]) for s in self.sketches]).reshape(-1, 3)
+        table = pd.DataFrame({
+            'count': self.count.astype('float64'),
+            'mean': np.where(empty, np.nan, self.mean),
+            'std': std,
+            'min': np.where(empty, np.nan, self.min),
+            '25%': quartiles[:, 0],
+            '50%': quartiles[:, 1],
+            '75%': quartiles[:, 2],
+            'max': np.where(empty, np.nan, self.max),
+        }, index=pd.Index(self.bins.labels, name=self.bins.column))
+        return table
+
+
+class GroupedQuantiles(Aggregate):
+    """按 by 分组的分位数：每组一个 KLL 草图（每组内存固定，与组内行数无关），合并时逐组合并草图
+    result 默认返回中位数，可传入任意分位数，结果可代替 df.groupby(by)[column].median() / quantile(qs)
+    """
+
+    state = ('sketches',)
+
+    def __init__(self, column, by, k=200):
+        self.column, self.by, self.k = column, by, k
+        self.columns = [column, by]
+        self.sketches = {}
+
+    def _sketch(self, group):
+        if group not in self.sketches:
+            self.sketches[group] = KLLSketch(k=self.k)
+        return self.sketches[group]
+
+    def update(self, df):
+        values = df[self.column].to_numpy('float64', na_value=np.nan)
+        codes, groups = pd.factorize(df[self.by])
+        valid = (codes >= 0) & ~np.isnan(values)
+        codes, values = codes[valid], values[valid]
+        # 按组编号排序后切分，每组只调用一次草图的 update
+        order = np.argsort(codes, kind='stable')
+        codes, values = codes[order], values[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(codes)]):
+            if end > start:
+                self._sketch(groups[codes[start]]).update(values[start:end])
+        return self
+
+    def merge(self, other):
+        for group, sketch in other.sketches.items():
+            self._sketch(group).merge(sketch)
+        return self
+
+    def result(self, qs=0.5):
+        """qs 为单个分位数时返回 Series，为列表时返回以分位数为列的 DataFrame"""
+        groups = list(self.sketches)
+        index = pd.Index(groups, name=self.by)
+        if np.ndim(qs) == 0:
+            return pd.Series([self.sketches[g].quantiles([qs])[0] for g in groups], index=index, name=self.column)
+        table = np.array([self.sketches[g].quantiles(qs) for g in groups]).reshape(-1, len(qs))
+        return pd.DataFrame(table, index=index, columns=list(qs))
+
+    def counts(self):
+        """每组的非空值个数"""
+        return pd.Series({g: s.n for g, s in self.sketches.items()}, name='count').rename_axis(self.by)
+
+
+class Filtered(Aggregate):
+    """只把 column 取值在 values 中的行交给内部聚合，用于分析前先筛选数据的图表（如只保留 男/女）"""
+
+    state = ()
+
+    def __init__(self, aggregate, column, values):
+        self.aggregate, self.column, self.values = aggregate, column, list(values)
+        self.columns = list(dict.fromkeys(aggregate.columns + [column]))
+        self.chunk_invariant = aggregate.chunk_invariant
+
+    def update(self, df):
+        self.aggregate.update(df[df[self.column].isin(self.values)])
+        return self
+
+    def merge(self, other):
+        self.aggregate.merge(other.aggregate)
+        return self
+
+    def result(self, *args, **kwargs):
+        return self.aggregate.result(*args, **kwargs)
+
+
+class PerChunk(Aggregate):
+    """对每块数据调用 fn 并按顺序保留结果，用于无法归约为固定大小状态的分析（fn 需为模块级函数，便于多进程序列化）
+    每块的行数就是 reduce_file 的 batch_size，结果随之变化，因此固定使用 batch_size，不参与自适应批次
+    """
+
+    chunk_invariant = False
+
+    def __init__(self, fn, columns):
+        self.fn = fn
+        self.columns = list(columns)
+        self.value = []
+
+    def update(self, df):
+        self.value.append(self.fn(df))
+        return self
+
+    def merge(self, other):
+        self.value.extend(other.value)
+        return self
+
+    def result(self):
+        return self.value
+
+
+def required_columns(aggregates):
+    """一组聚合需要读取的列（保持顺序、去重）"""
+    return list(dict.fromkeys(c for a in aggregates.values() for c in a.columns))
+
+
+def update_all(aggregates, df):
+    for aggregate in aggregates.values():
+        aggregate.update(df)
+    return aggregates
+
+
+def merge_all(aggregates, other):
+    for name, aggregate in aggregates.items():
+        aggregate.merge(other[name])
+    return aggregates
+
+
+def results(aggregates):
+    return {name: aggregate.result() for name, aggregate in aggregates.items()}
+
+
+def reduce_file(path, make_aggregates, frac=None, batch_size=500000, memory_limit_mb=None):
+    """逐批读取一个 Parquet 文件（只读需要的列），归约为一组部分聚合状态
+    make_aggregates 返回 {名称: 聚合} 的新实例；frac 不为空时按 id 哈希抽样（与预处理的抽样层级一致）；
+    memory_limit_mb 不为空时以 batch_size 为初始值，由 自适应批次.AdaptiveBatchController 在内存上限以内调整批次大小
+    （有结果依赖分块方式的聚合时仍使用固定的 batch_size）
+    """
+    aggregates = make_aggregates()
+    columns = required_columns(aggregates)
+    parquet_file = pq.ParquetFile(path)
+    read_columns = columns + [SAMPLE_KEY] if frac is not None and SAMPLE_KEY not in columns else columns
+    adaptive = memory_limit_mb is not None and all(a.chunk_invariant for a in aggregates.values())
+    if adaptive:
+        controller = AdaptiveBatchController(memory_limit_mb, initial_size=batch_size, verbose=False)
+        batches = adaptive_batches(parquet_file.iter_batches(batch_size=min(batch_size, 10000),
+                                                             columns=read_columns), controller)
+    else:
+        batches = parquet_file.iter_batches(batch_size=batch_size, columns=read_columns)
+    for batch in batches:
+        if frac is not None:
+            batch = batch.filter(pa.array(sample_mask(batch.column(SAMPLE_KEY), frac)))
+        update_all(aggregates, batch.to_pandas())
+    return aggregates
+
+
+def reduce_files(files, make_aggregates, frac=None, batch_size=500000, memory_limit_mb=None):
+    """依次归约每个文件并合并部分状态，返回合并后的聚合状态；内存只与状态大小有关"""
+    total = make_aggregates()
+    for path in files:
+        merge_all(total, reduce_file(path, make_aggregates, frac=frac, batch_size=batch_size,
+                                     memory_limit_mb=memory_limit_mb))
+    return total
@@ -0,0 +1,72 @@
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# 10G/30G预处理流水线配置：只读取流水线真正用到的列，并在JSON解析之前用廉价的数值条件过滤行
+PIPELINE_SPEC = {
+    'columns': ['id', 'timestamp', 'registration_date', 'age', 'income', 'credit_score',
+                'gender', 'country', 'chinese_address', 'purchase_history'],
+    # 列 -> (下界, 上界, 是否包含边界)；缺失值保留，由后续的中位数填充处理
+    'filters': {
+        'age': (0, 120, False),
+        'credit_score': (300, 850, True),
+    },
+    # 使用全局统计量中的IQR边界过滤（需要先完成全局统计）
+    'iqr_columns': ['income'],
+}
+
+# 数据预处理.py 的配置：保留全部列，不过滤信用分
+CLEAN_PIPELINE_SPEC = {
+    'columns': None,
+    'filters': {
+        'age': (0, 120, False),
+    },
+    'iqr_columns': ['income'],
+}
+
+
+def build_filter(spec=PIPELINE_SPEC, global_stats=None):
+    """根据流水线配置构造 pyarrow.dataset 的过滤表达式"""
+    expr = None
+    bounds = {c: (lo, hi, inclusive) for c, (lo, hi, inclusive) in spec['filters'].items()}
+    if global_stats is not None:
+        for c in spec['iqr_columns']:
+            bounds[c] = (global_stats[c]['lower'], global_stats[c]['upper'], True)
+
+    for c, (lo, hi, inclusive) in bounds.items():
+        field = ds.field(c)
+        if inclusive:
+            cond = (field >= lo) & (field <= hi)
+        else:
+            cond = (field > lo) & (field < hi)
+        cond = field.is_null() | cond
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def plan_file_groups(input_file, rows_per_file):
+    """按 row group 把输入文件划分为若干组，每组对应一个输出文件（约 rows_per_file 行）"""
+    metadata = pq.ParquetFile(input_file).metadata
+    groups, current, rows = [], [], 0
+    for i in range(metadata.num_row_groups):
+        current.append(i)
+        rows += metadata.row_group(i).num_rows
+        if rows >= rows_per_file:
+            groups.append(current)
+            current, rows = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def scan_row_groups(input_file, row_groups, spec=PIPELINE_SPEC, global_stats=None, batch_size=50000):
+    """用 pyarrow.dataset 扫描指定的 row group：列裁剪和过滤条件下推到读取阶段，按原始行序返回批次"""
+    dataset = ds.dataset(input_file, format='parquet')
+    fragment = next(dataset.get_fragments()).subset(row_group_ids=row_groups)
+    columns = spec['columns']
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    scanner = ds.Scanner.from_fragment(fragment, schema=dataset.schema, columns=columns,
+                                       filter=build_filter(spec, global_stats), batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch
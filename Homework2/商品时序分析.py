@@ -1,61 +1,31 @@
 import pandas as pd
-import json
-import os
-from tqdm import tqdm
-from collections import Counter
 from 子类 import product_dict  # 用于大类映射
+from 订单明细 import load_order_items
 
 # 显示所有列
 pd.set_option('display.max_columns', None)
-tqdm.pandas(desc="解析购买顺序")
 
-# 读取商品目录
-with open("product_catalog.json", "r", encoding="utf-8") as f:
-    catalog = json.load(f)
-id_to_category = {item["id"]: item["category"] for item in catalog["products"]}
+# 读取订单明细事实表（预处理时由 purchase_history 一次性展开）并按订单抽样
+print("读取订单明细并提取购买顺序对...")
+items = load_order_items('30G_data_new', columns=['item_position', 'subcategory', 'main_category'], frac=0.033)
 
+# 子类不在大类映射中的商品不参与顺序统计
+items = items[items['subcategory'].isin(list(product_dict))]
 
-# 函数：将购买记录转为有序大类序列对
-def extract_category_pairs(purchase_str):
-    try:
-        record = json.loads(purchase_str)
-        item_ids = [item["id"] for item in record.get("items", [])]
-        categories = [product_dict.get(id_to_category.get(i, None), None) for i in item_ids]
-        categories = [c for c in categories if c is not None]
-
-        pairs = []
-        for i in range(len(categories)):
-            for j in range(i + 1, len(categories)):
-                if categories[i] != categories[j]:  # 前后不同
-                    pairs.append((categories[i], categories[j]))
-        return pairs
-    except:
-        return []
-
-
-# 读取和抽样 parquet 文件
-folder_path = '30G_data_new'
-all_pairs = []
-
-print("读取 parquet 并提取购买顺序对...")
-for filename in os.listdir(folder_path):
-    if filename.endswith(".parquet"):
-        print(f"读取: {filename}")
-        df = pd.read_parquet(os.path.join(folder_path, filename), columns=['purchase_history'])
-        sampled_df = df.sample(frac=0.033, random_state=42)
-        sampled_df['pair_list'] = sampled_df['purchase_history'].progress_apply(extract_category_pairs)
-        for row in sampled_df['pair_list']:
-            all_pairs.extend(row)
+# 同一订单内先后购买（位置靠前 -> 靠后）且大类不同的商品对
+pairs = items.merge(items, on='row_id', suffixes=('_from', '_to'))
+pairs = pairs[(pairs['item_position_from'] < pairs['item_position_to'])
+              & (pairs['main_category_from'].astype(object) != pairs['main_category_to'].astype(object))]
 
 # 统计频率
-pair_counter = Counter(all_pairs)
-total = sum(pair_counter.values())
+pair_counter = pairs.groupby(['main_category_from', 'main_category_to'], observed=True).size()
+total = pair_counter.sum()
 
 # 构造结果 DataFrame
 df_result = pd.DataFrame([
     {"from": k[0], "to": k[1], "count": v, "support": v / total}
     for k, v in pair_counter.items()
-])
+], columns=["from", "to", "count", "support"])
 df_result = df_result.sort_values(by="count", ascending=False)
 
 # 保存 CSV
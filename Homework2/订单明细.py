@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from 子类 import product_dict
+
+# JSON 整列解析与 Homework1 的预处理共用同一实现（批量解析.py），两边的解析方式不会出现差异
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Homework1'))
+from 批量解析 import PURCHASE_SCHEMA, decode_json_column  # noqa: E402
+
+# 订单明细事实表的存放目录：order_items/<原始数据目录名>/<原始文件名>.parquet
+ORDER_ITEMS_DIR = 'order_items'
+# 事实表目录中的清单：记录构建时所用商品目录的指纹，商品目录变化时全部重建
+MANIFEST_FILE = '_manifest.json'
+
+# 事实表结构：每个购买的商品一行；没有商品的订单保留一行，商品相关列为空
+ORDER_ITEMS_SCHEMA = pa.schema([
+    ('row_id', pa.int64()),
+    ('item_position', pa.int16()),
+    ('item_id', pa.int64()),
+    ('subcategory', pa.dictionary(pa.int32(), pa.string())),
+    ('main_category', pa.dictionary(pa.int32(), pa.string())),
+    ('price', pa.float64()),
+    ('purchase_date', pa.date32()),
+    ('payment_method', pa.dictionary(pa.int32(), pa.string())),
+    ('payment_status', pa.dictionary(pa.int32(), pa.string())),
+])
+
+NULLABLE_INTEGERS = {pa.int16(): pd.Int16Dtype(), pa.int64(): pd.Int64Dtype()}
+
+
+def load_catalog(catalog_path='product_catalog.json'):
+    """读取商品目录，返回 (商品id数组, 子类数组, 大类数组, 价格数组)，大类按 子类.product_dict 映射"""
+    with open(catalog_path, 'r', encoding='utf-8') as f:
+        products = json.load(f)['products']
+    subcategories = [p.get('category') for p in products]
+    return (
+        pa.array([p['id'] for p in products], type=pa.int64()),
+        pa.array(subcategories, type=pa.string()),
+        pa.array([product_dict.get(c, c) if c else None for c in subcategories], type=pa.string()),
+        pa.array([p.get('price') for p in products], type=pa.float64()),
+    )
+
+
+def catalog_fingerprint(catalog_path='product_catalog.json'):
+    """商品目录的指纹：目录文件内容和 子类.product_dict（子类到大类的映射）的哈希，任何一个变化事实表都要重建"""
+    digest = hashlib.sha1()
+    with open(catalog_path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(json.dumps(product_dict, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def decode_purchases(column):
+    """用 pyarrow 的JSON读取器整批解析 purchase_history 列（批量解析.decode_json_column）"""
+    return decode_json_column(column, PURCHASE_SCHEMA)
+
+
+def explode_purchases(batch, catalog):
+    """把一批原始记录展开为订单明细：每个商品一行，并按商品目录补充子类、大类和价格"""
+    catalog_ids, catalog_sub, catalog_main, catalog_price = catalog
+    purchases = decode_purchases(batch.column('purchase_history'))
+    items = purchases.column('items').combine_chunks()
+
+    lengths = pc.fill_null(pc.list_value_length(items), 0).to_numpy(zero_copy_only=False)
+    counts = np.maximum(lengths, 1)
+    parent = np.repeat(np.arange(len(lengths)), counts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    position = np.arange(counts.sum()) - np.repeat(starts, counts)
+    has_item = np.repeat(lengths > 0, counts)
+
+    item_ids = np.zeros(len(parent), dtype=np.int64)
+    flat = pc.list_flatten(items).field('id')
+    item_ids[has_item] = pc.fill_null(flat, 0).to_numpy(zero_copy_only=False)
+    item_valid = has_item.copy()
+    item_valid[has_item] = flat.is_valid().to_numpy(zero_copy_only=False)
+    item_id = pa.array(item_ids, mask=~item_valid)
+
+    index = pc.index_in(item_id, value_set=catalog_ids)
+    dates = pc.strptime(purchases.column('purchase_date'), format='%Y-%m-%d', unit='s', error_is_null=True)
+    order_take = pa.array(parent)
+
+    return pa.table({
+        'row_id': batch.column('id').take(order_take),
+        'item_position': pa.array(position.astype(np.int16), mask=~has_item),
+        'item_id': item_id,
+        'subcategory': pc.dictionary_encode(catalog_sub.take(index)),
+        'main_category': pc.dictionary_encode(catalog_main.take(index)),
+        'price': catalog_price.take(index),
+        'purchase_date': dates.cast(pa.date32()).take(order_take),
+        'payment_method': pc.dictionary_encode(purchases.column('payment_method').take(order_take)),
+        'payment_status': pc.dictionary_encode(purchases.column('payment_status').take(order_take)),
+    }, schema=ORDER_ITEMS_SCHEMA)
+
+
+def build_order_items(source_dir='30G_data_new', output_dir=ORDER_ITEMS_DIR, catalog_path='product_catalog.json',
+                      batch_size=200000):
+    """把原始数据中的 purchase_history 一次性展开写成订单明细事实表，返回事实表目录
+    已是最新的文件跳过：输出比原始文件新，且构建时的商品目录与当前一致（清单中记录商品目录的指纹）
+    """
+    target_dir = os.path.join(output_dir, os.path.basename(os.path.normpath(source_dir)))
+    os.makedirs(target_dir, exist_ok=True)
+    manifest_path = os.path.join(target_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    fingerprint = catalog_fingerprint(catalog_path)
+    # 商品目录（子类、价格）或子类到大类的映射变化时，已有的事实表全部过期
+    catalog_changed = manifest.get('catalog') != fingerprint
+    if catalog_changed and manifest:
+        print(f"商品目录已变化，重建全部订单明细: {target_dir}")
+    catalog = None
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith('.parquet'):
+            continue
+        source = os.path.join(source_dir, filename)
+        target = os.path.join(target_dir, filename)
+        if (not catalog_changed and os.path.exists(target)
+                and os.path.getmtime(target) >= os.path.getmtime(source)):
+            continue
+        if catalog is None:
+            catalog = load_catalog(catalog_path)
+        print(f"正在展开订单明细: {filename}")
+        tmp = target + '.tmp'
+        parquet_file = pq.ParquetFile(source)
+        with pq.ParquetWriter(tmp, ORDER_ITEMS_SCHEMA, compression='zstd') as writer:
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=['id', 'purchase_history']):
+                writer.write_table(explode_purchases(batch, catalog))
+        os.replace(tmp, target)
+    if catalog_changed:
+        # 所有文件都用当前的商品目录重建完成后才更新清单，中途失败时下次仍会全部重建
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'catalog': fingerprint}, f, ensure_ascii=False, indent=2)
+    return target_dir
+
+
+def sample_orders(items, frac, seed=42):
+    """按订单抽样（同一订单的所有商品同时保留或丢弃）"""
+    row_ids = pc.unique(items.column('row_id'))
+    rng = np.random.default_rng(seed)
+    keep = row_ids.filter(pa.array(rng.random(len(row_ids)) < frac))
+    return items.filter(pc.is_in(items.column('row_id'), value_set=keep))
+
+
+def read_order_tables(source_dir='30G_data_new', columns=None, frac=None, files=None, seed=42):
+    """逐个文件读取订单明细事实表（不存在或过期时先构建），依次返回 Arrow 表，frac 不为空时按订单抽样"""
+    target_dir = build_order_items(source_dir)
+    files = files or sorted(f for f in os.listdir(target_dir) if f.endswith('.parquet'))
+    if columns is not None and 'row_id' not in columns:
+        columns = ['row_id'] + list(columns)
+    for filename in files:
+        print(f"读取: {filename}")
+        table = pq.read_table(os.path.join(target_dir, filename), columns=columns)
+        yield sample_orders(table, frac, seed) if frac is not None else table
+
+
+def to_frame(table):
+    """转换为 DataFrame：可空整数列保持整数类型，日期列转换为 datetime64 便于按星期/月份/季度取值"""
+    return table.to_pandas(date_as_object=False, types_mapper=NULLABLE_INTEGERS.get)
+
+
+def iter_order_items(source_dir='30G_data_new', columns=None, frac=None, files=None, seed=42):
+    """每次返回一个文件的订单明细 DataFrame；按文件累计计数的脚本用它，内存只与单个文件有关"""
+    for table in read_order_tables(source_dir, columns, frac, files, seed):
+        yield to_frame(table)
+
+
+def load_order_items(source_dir='30G_data_new', columns=None, frac=None, files=None, seed=42):
+    """读取订单明细事实表并合并为一个 DataFrame，frac 不为空时逐个文件按订单抽样后再合并
+    注意：frac 为空时所选文件的全部明细都会载入内存，只需要计数时用 iter_order_items 逐个文件累计
+    """
+    tables = list(read_order_tables(source_dir, columns, frac, files, seed))
+    return to_frame(pa.concat_tables(tables, promote_options='default'))
+
+
+def order_transactions(items, label=None):
+    """按订单汇总去重后的商品大类作为事务，label 为每个订单追加的标签列（为空时不追加）"""
+    order_ids = items['row_id'].drop_duplicates()
+    parts = [items[['row_id', 'main_category']].rename(columns={'main_category': 'item'})]
+    if label is not None:
+        orders = items.drop_duplicates('row_id')
+        parts.append(pd.DataFrame({'row_id': orders['row_id'], 'item': orders[label]}))
+    pairs = pd.concat([p.astype({'item': object}) for p in parts]).dropna().drop_duplicates()
+    grouped = pairs.groupby('row_id', sort=False)['item'].agg(list)
+    return [x if isinstance(x, list) else [] for x in grouped.reindex(order_ids)]
+
+
+if __name__ == "__main__":
+    # 预处理：python 订单明细.py 30G_data_new
+    for source in sys.argv[1:] or ['30G_data_new']:
+        print(f"订单明细已写入: {build_order_items(source)}")
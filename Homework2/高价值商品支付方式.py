@@ -1,41 +1,22 @@
-import json
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib
-
-# 加载商品目录，获取 id → price 映射
-with open("product_catalog.json", "r", encoding="utf-8") as f:
-    catalog = json.load(f)
+from 订单明细 import iter_order_items
 
 matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei']
 matplotlib.rcParams['axes.unicode_minus'] = False
 
-id_to_price = {item["id"]: item["price"] for item in catalog["products"]}
-
-# 加载主数据集
-df = pd.read_parquet("10G_data_new/part-00000.parquet")  # 或 CSV，根据你格式来改
-
-# 初始化计数字典
-from collections import Counter
-
-payment_counter = Counter()
-
-# 遍历每条购买记录
-for _, row in df.iterrows():
-    try:
-        record = json.loads(row["purchase_history"])
-        items = record.get("items", [])
-        payment_method = record.get("payment_method")
-        for item in items:
-            pid = item.get("id")
-            price = id_to_price.get(pid, 0)
-            if price > 5000 and payment_method:
-                payment_counter[payment_method] += 1
-    except Exception:
-        continue
+# 逐个文件读取订单明细事实表（价格已在预处理时按商品目录补齐），统计高价值商品（价格大于 5000）的支付方式，
+# 每个文件只保留计数，不把全部明细载入内存
+payment_counter = None
+for items in iter_order_items("10G_data_new", columns=["price", "payment_method"], files=["part-00000.parquet"]):
+    high_value = items[(items["price"] > 5000) & items["payment_method"].notna()]
+    counts = high_value["payment_method"].astype(object).value_counts()
+    payment_counter = counts if payment_counter is None else payment_counter.add(counts, fill_value=0)
+payment_counter = payment_counter.astype(int) if payment_counter is not None else pd.Series(dtype=int)
 
 # 转换为 DataFrame 方便绘图
-payment_df = pd.DataFrame(payment_counter.items(), columns=["支付方式", "数量"])
+payment_df = pd.DataFrame({"支付方式": payment_counter.index.astype(str), "数量": payment_counter.values})
 
 # 对数据进行排序，数量由高到低
 payment_df = payment_df.sort_values(by="数量", ascending=False)